@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+#
+# Measure memory and time used to create INFECTION events of infectors.
+#
+#   python benchmark_events.py [n_infectors]
+#
+import sys
+import time
+import tracemalloc
+from io import StringIO
+
+import numpy as np
+
+from covid19_outbreak_simulator.model import Model, Params
+from covid19_outbreak_simulator.population import Individual
+
+
+def benchmark_events(n_infectors):
+    logger = StringIO()
+    logger.id = 1
+    model = Model(Params())
+    individuals = [
+        Individual(str(i), 1, model, logger) for i in range(n_infectors)
+    ]
+    # 24 infections per infector on a 12 day hourly grid
+    x_infected = np.linspace(0, 12, 288)[::12]
+
+    start = time.time()
+    evts = [
+        evt for ind in individuals for evt in ind._schedule_infections(
+            0, x_infected, ['remove', 1])
+    ]
+    elapsed = time.time() - start
+    del evts
+
+    tracemalloc.start()
+    evts = [
+        evt for ind in individuals for evt in ind._schedule_infections(
+            0, x_infected, ['remove', 1])
+    ]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'events:\t{len(evts)}')
+    print(f'bytes_per_event:\t{size / len(evts):.0f}')
+    print(f'us_per_event:\t{elapsed * 1e6 / len(evts):.2f}')
+
+
+if __name__ == '__main__':
+    benchmark_events(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+#
+# Measure time used to calculate transmission probabilities of symptomatic
+# infections with the normal model, with sd_left solved by bisect and with
+# frozen scipy distributions (before), and with the closed form of sd_left
+# and numpy densities (after).
+#
+#   python benchmark_kernels.py [n_infections]
+#
+import sys
+import time
+
+import numpy as np
+from scipy.optimize import bisect
+from scipy.stats import norm
+
+from covid19_outbreak_simulator.model import Model, Params
+
+
+def legacy_transmission_probability(model, incu, R0, params):
+    # the original implementation of get_normal_symptomatic_transmission_probability
+    incu = incu * 2 / 3
+    dist_right = norm(incu, model.sd_6)
+    interval = model.params.simulation_interval
+    x = np.linspace(0, incu + params[0], int((incu + params[0]) / interval))
+    if incu <= interval:
+        y = dist_right.pdf(x)
+    else:
+        try:
+            sd_left = bisect(
+                lambda x: norm.cdf(2 * incu, loc=incu, scale=x) - 0.99,
+                a=0.001,
+                b=15,
+                xtol=0.001,
+            )
+        except:
+            sd_left = 0.0
+        dist_left = norm(incu, sd_left)
+        scale = dist_right.pdf(incu) / dist_left.pdf(incu)
+        idx = int(incu / interval)
+        y = np.concatenate(
+            [dist_left.pdf(x[:idx]) * scale, dist_right.pdf(x[idx:])]
+        )
+    return x, y / sum(y) * R0
+
+
+def benchmark_kernels(n_infections):
+    model = Model(Params())
+    incus = [model.draw_random_incubation_period() for i in range(n_infections)]
+
+    start = time.time()
+    legacy = [legacy_transmission_probability(model, incu, 1, [8]) for incu in incus]
+    before = time.time() - start
+
+    start = time.time()
+    kernels = [model.get_normal_symptomatic_transmission_probability(incu, 1, [8]) for incu in incus]
+    after = time.time() - start
+
+    error = max(np.abs(x[1] - y[1]).max() for x, y in zip(legacy, kernels))
+    print(f'infections:\t{n_infections}')
+    print(f'us_per_infection_before:\t{before * 1e6 / n_infections:.2f}')
+    print(f'us_per_infection_after:\t{after * 1e6 / n_infections:.2f}')
+    print(f'max_difference:\t{error:.3g}')
+
+
+if __name__ == '__main__':
+    benchmark_kernels(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -9,7 +9,8 @@ import numpy as np
 from tqdm import tqdm
 
 from .model import Params, summarize_model
-from .simulator import Simulator, load_plugins
+from .simulator import Simulator, load_plugins, parse_stop_if
+from .vectorized import VectorizedSimulator
 from .report import summarize_simulations
 
 
@@ -107,12 +108,22 @@ def parse_args(args=None):
         help='''Number of replicates to simulate. An ID starting from
               1 will be assinged to each replicate and as the first columns
               in the log file.''')
+    parser.add_argument(
+        '--batch-size',
+        default=1,
+        type=int,
+        help='''Number of replicates that are simulated together by a worker.
+            With the vectorized engine, replicates of a batch are simulated in lock-step
+            with states of all replicates kept in the same arrays, which reduces the
+            overhead of simulating many replicates of small populations. Replicates are
+            simulated one by one by the event engine.''')
     parser.add_argument(
         '--resume',
         action='store_true',
         help='''If true, resume from last interrupted simulations. Existing logfile will not
             be erased if exists. Note that this option does not check if the previous simulations
-            use the same options, or if they have corrected completed.''')
+            use the same options, or if they have corrected completed. Interrupted replicates
+            are continued from their checkpoints if --checkpoint-dir is specified.''')
     parser.add_argument(
         '--handle-symptomatic',
         nargs='*',
@@ -132,7 +143,109 @@ def parse_args(args=None):
     parser.add_argument(
         '--interval',
         default=1 / 24,
+        type=float,
         help='Interval of simulation, default to 1/24, by hour')
+    parser.add_argument(
+        '--engine',
+        default='event',
+        choices=['event', 'vectorized'],
+        help='''Simulation engine, which can be "event" (default), which simulates
+            individuals and their events one by one, or "vectorized", which keeps states of
+            the population in arrays and advances the population in steps of --interval,
+            with infections of each step drawn for all infectors at once. The vectorized
+            engine is much faster for large populations but it only supports plugins
+            init, community_infection, stat and quarantine, does not support --trigger-by
+            of plugins, and ignores options --event-queue, --lazy-schedule,
+            --infection-sampler, --kernel-tolerance and --verify-kernels.''')
+    parser.add_argument(
+        '--event-queue',
+        default='heap',
+        choices=['heap', 'calendar', 'legacy'],
+        help='''Data structure used to keep pending events, which can be "heap"
+            (default), a priority queue ordered by time, "calendar", which rounds
+            event times to multiples of --interval and processes events in buckets
+            of these time points, or "legacy", the original implementation that
+            groups events by time in a dictionary. The "heap" and "legacy" queues
+            process events in the same order and the latter is kept only for
+            comparison.''')
+    parser.add_argument(
+        '--lazy-schedule',
+        action='store_true',
+        help='''Schedule only the next infection of each infector, and schedule
+            the following one when the infection happens. This keeps the number
+            of pending events proportional to the number of active infectors
+            instead of the number of future infections, which reduces memory
+            usage of simulations of large populations with high R0.''')
+    parser.add_argument(
+        '--infection-sampler',
+        default='bernoulli',
+        choices=['bernoulli', 'thinning', 'poisson', 'continuous'],
+        help='''How infections caused by each infected individual are drawn from its
+            transmission probabilities at each time point, which can be "bernoulli"
+            (default), which draws whether or not an infection happens at each time point,
+            "thinning", which draws from the same distribution with a cost proportional
+            to the number of infections instead of the number of time points, or
+            "poisson", which approximates the number of infections with a Poisson
+            distribution and draws the times of infections from the transmission
+            probabilities, or "continuous", which draws a Poisson number of infections
+            and their times from transmission curves in continuous time, so that times of
+            infections are not rounded to multiples of --interval and the cost of drawing
+            infections does not grow with finer --interval. All samplers draw from the
+            same distribution except for the approximations of "poisson" and "continuous",
+            but they use random numbers differently so replicates simulated with the same
+            random seed differ. --kernel-tolerance does not apply to infections drawn by
+            the "continuous" sampler.''')
+    parser.add_argument(
+        '--kernel-tolerance',
+        type=float,
+        help='''If specified, round incubation periods and durations of infection
+            to the nearest multiples of the specified value (e.g. 0.05 day) when
+            transmission probabilities of infected individuals are calculated, so
+            that the transmission curves are calculated once for each point of the
+            grid and shared by all replicates simulated by each process. Default to
+            calculating exact transmission curves for each individual.''')
+    parser.add_argument(
+        '--verify-kernels',
+        action='store_true',
+        help='''Calculate exact transmission curves of infected individuals along with
+            curves on the grid of --kernel-tolerance, and report the largest difference
+            between the probabilities of transmission (with R0=1) of the two curves as
+            kernel_error of the END event.''')
+    parser.add_argument(
+        '--snapshot-at',
+        type=float,
+        help='''Save the state of each replicate, including the population, pending
+            events, random number generators and plugins, before events at the specified
+            time to --snapshot-dir, so that simulations with different plugins can be
+            forked from the snapshots with option --fork-from.''')
+    parser.add_argument(
+        '--snapshot-dir',
+        default='snapshots',
+        help='''Directory to save snapshots of replicates, default to "snapshots".''')
+    parser.add_argument(
+        '--fork-from',
+        help='''Continue replicates from snapshots in the specified directory, saved
+            by a simulation with option --snapshot-at. Plugins calls of the original
+            simulation at or after the time of the snapshot are replaced by plugin calls of
+            this simulation unless the same plugins are specified, so that the effects of
+            different interventions can be compared with replicates sharing the same
+            history. Replicates that ended before the time of the snapshot are copied.''')
+    parser.add_argument(
+        '--checkpoint-dir',
+        help='''Directory to save checkpoints of replicates that are being simulated,
+            so that interrupted simulations can be resumed with option --resume from the
+            latest checkpoints instead of from the beginning. Checkpoints of replicates
+            are removed after the replicates are written to the logfile.''')
+    parser.add_argument(
+        '--checkpoint-interval',
+        type=float,
+        default=10,
+        help='''Interval in simulated days between checkpoints, default to 10.''')
+    parser.add_argument(
+        '--checkpoint-minutes',
+        type=float,
+        help='''If specified, also save a checkpoint if the specified minutes have
+            passed since the last checkpoint.''')
     parser.add_argument('--logfile', default='simulation.log', help='logfile')
 
     parser.add_argument(
@@ -145,10 +258,16 @@ def parse_args(args=None):
     parser.add_argument(
         '--stop-if',
         nargs='*',
-        help='''Condition at which the simulation will end. By default the simulation
+        help='''Conditions at which the simulation will end. By default the simulation
             stops when all individuals are affected or all infected individuals
-            are removed. Current you can specify a time after which the simulation
-            will stop in the format of `--stop-if "t>10"' (for 10 days).''')
+            are removed. You can specify a time after which the simulation
+            will stop in the format of `--stop-if "t>10"' (for 10 days), or conditions
+            on the number of infected (n_infected, including recovered), recovered
+            (n_recovered) and active (n_active) individuals, and size of the population
+            (popsize), such as `n_infected>200`, `n_active==0` and `popsize<50`, which
+            are checked after each time point. Operators >, >=, <, <=, == and != are
+            allowed. The simulation stops when any of the conditions is met, and the
+            condition is recorded as stopped_by of the END event.''')
     parser.add_argument(
         '--leadtime',
         help='''With "leadtime" infections are assumed to happen before the simulation.
@@ -221,28 +340,42 @@ class Worker(multiprocessing.Process):
         np.random.seed()
 
         while True:
-            id = self.task_queue.get()
-            if id is None:
+            ids = self.task_queue.get()
+            if ids is None:
                 self.task_queue.task_done()
                 break
-            with FilteredStringIO(id, track_events = self.simu_args.track_events) as logger:
-                simu = Simulator(
-                    params=self.params,
-                    logger=logger,
-                    simu_args=self.simu_args,
-                    cmd=self.cmd)
-                try:
-                    simu.simulate(id)
-                except (SystemExit, Exception) as e:
-                    msg = repr(e).replace('\n',
-                                          ' ').replace('\t',
-                                                       ' ').replace(',', ' ')
-                    logger.write(f'{id}\t0.00\tERROR\t.\texception={msg}\n')
-                    self.task_queue.task_done()
-                    self.result_queue.put(logger.getvalue())
-                    raise e
+            loggers = [FilteredStringIO(id, track_events = self.simu_args.track_events) for id in ids]
+            try:
+                if self.simu_args.engine == 'vectorized':
+                    # simulate all replicates of the batch in lock-step
+                    VectorizedSimulator(
+                        params=self.params,
+                        logger=loggers[0],
+                        simu_args=self.simu_args,
+                        cmd=self.cmd).simulate_batch(loggers)
+                else:
+                    for id, logger in zip(ids, loggers):
+                        Simulator(
+                            params=self.params,
+                            logger=logger,
+                            simu_args=self.simu_args,
+                            cmd=self.cmd).simulate(id)
+            except (SystemExit, Exception) as e:
+                msg = repr(e).replace('\n',
+                                      ' ').replace('\t',
+                                                   ' ').replace(',', ' ')
+                for logger in loggers:
+                    # replicates of the batch that have finished are not errors
+                    if '\tEND\t' not in logger.getvalue():
+                        logger.write(f'{logger.id}\t0.00\tERROR\t.\texception={msg}\n')
                 self.task_queue.task_done()
+                for logger in loggers:
+                    self.result_queue.put(logger.getvalue())
+                raise e
+            self.task_queue.task_done()
+            for logger in loggers:
                 self.result_queue.put(logger.getvalue())
+                logger.close()
 
 
 def main(argv=None):
@@ -271,19 +404,17 @@ def main(argv=None):
     if not args.jobs:
         args.jobs = multiprocessing.cpu_count()
 
+    if args.fork_from is not None and not os.path.isdir(args.fork_from):
+        raise ValueError(f'Snapshot directory {args.fork_from} does not exist.')
+
+    if args.batch_size < 1:
+        raise ValueError('Option --batch-size should be a positive integer.')
+
     if args.stop_if is not None:
-        if args.stop_if[0].startswith('t>'):
-            #
-            try:
-                float(args.stop_if[0][2:])
-            except Exception as e:
-                raise ValueError(
-                    f'Invalid value for option --stop-if "{args.stop_if[0]}": {e}'
-                )
-        else:
-            raise ValueError(
-                f'Option --stop-if currently only supports t>TIME to stop after certain time point.'
-            )
+        try:
+            parse_stop_if(args.stop_if)
+        except ValueError as e:
+            raise ValueError(f'Invalid option --stop-if: {e}')
 
     completed_ids = set()
     append_mode = os.path.isfile(args.logfile) and args.resume
@@ -326,9 +457,13 @@ def main(argv=None):
         print(f'All simulations have been performed. Remove {args.logfile} if you would like to rerun.')
         return 0
 
+    # replicates are submitted in batches of --batch-size IDs
+    ids = [i + 1 for i in range(args.repeats) if i + 1 not in completed_ids]
+    batches = [ids[i:i + args.batch_size] for i in range(0, len(ids), args.batch_size)]
+
     workers = [
         Worker(tasks, results, args, cmd=argv if argv else sys.argv[1:])
-        for i in range(min(args.jobs, args.repeats))
+        for i in range(min(args.jobs, len(batches)))
     ]
     for worker in workers:
         worker.start()
@@ -337,10 +472,9 @@ def main(argv=None):
     with open(args.logfile, 'a' if append_mode else 'w') as logger:
         if not append_mode:
             logger.write('id\ttime\tevent\ttarget\tparams\n')
-        for i in range(args.repeats):
-            if i+1 not in completed_ids:
-                submitted += 1
-                tasks.put(i + 1)
+        for batch in batches:
+            submitted += len(batch)
+            tasks.put(batch)
         for i in range(args.jobs):
             tasks.put(None)
         #
@@ -348,6 +482,13 @@ def main(argv=None):
             total=args.repeats, initial=len(completed_ids)):
             result = results.get()
             logger.write(result)
+            if args.checkpoint_dir:
+                # the replicate is safely written and its checkpoint is no longer needed
+                logger.flush()
+                id = result.split('\t', 1)[0]
+                checkpoint = os.path.join(args.checkpoint_dir, f'{id}.pickle')
+                if os.path.isfile(checkpoint):
+                    os.remove(checkpoint)
             if 'ERROR' in result:
                 break
 
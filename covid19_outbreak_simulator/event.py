@@ -1,3 +1,4 @@
+import numbers
 from enum import Enum
 
 class EventType(Enum):
@@ -38,6 +39,7 @@ class Event(object):
     '''
     Events that happen during the simulation.
     '''
+    __slots__ = ('time', 'action', 'target', 'logger', 'kwargs', 'priority')
 
     def __init__(self,
                  time,
@@ -50,100 +52,89 @@ class Event(object):
         self.action = action
         if target is None or isinstance(target, str):
             self.target = target
+        elif isinstance(target, numbers.Integral):
+            # rows may come from numpy arrays as numpy integers
+            self.target = int(target)
         else:
             raise ValueError(
-                f'Target of events should be None or an ID: {target} of type {target.__class__.__name__} provided'
+                f'Target of events should be None, an ID or a row: {target} of type {target.__class__.__name__} provided'
             )
         self.logger = logger
         self.kwargs = kwargs
         self.priority = priority
 
+    @classmethod
+    def with_shared_kwargs(cls, time, action, target, logger, kwargs, priority=False):
+        '''Create an event that shares the dictionary of parameters kwargs
+        with other events, which should therefore not be modified.'''
+        evt = cls.__new__(cls)
+        evt.time = time
+        evt.action = action
+        evt.target = target
+        evt.logger = logger
+        evt.kwargs = kwargs
+        evt.priority = priority
+        return evt
+
     def apply(self, population):
         if self.action == EventType.INFECTION:
-            if 'by' not in self.kwargs:
-                raise ValueError('Parameter by is required for INECTION event.')
-
-            if self.kwargs['by'] is not None:
-                # if infector is removed or quarantined
-                if self.kwargs['by'] not in population:
-                    self.logger.write(
-                        f'{self.logger.id}\t{self.time:.2f}\t{EventType.INFECTION_AVOIDED.name}\t.\tby={self.kwargs["by"]},reason=REMOVED\n'
-                    )
-                    return []
-                #
-                by_ind = population[self.kwargs['by']]
-                if by_ind.quarantined and by_ind.quarantined >= self.time:
-                    self.logger.write(
-                        f'{self.logger.id}\t{self.time:.2f}\t{EventType.INFECTION_AVOIDED.name}\t.\tby={by_ind.id},reason=QUARANTINED\n'
-                    )
-                    return []
-
-            # determin einfectee
-            if self.target is not None:
-                # if the target is preselected (e.g. through init plugin or infector)
-                if self.target not in population:
-                    self.logger.write(
-                        f'{self.logger.id}\t{self.time:.2f}\t{EventType.WARNING.name}\t{self.target}\tmsg=INFECTION target no longer exists\n'
-                    )
-                    return []
-                infectee = self.target
-            else:
-                # select infectee from the population, subject to vicinity of infector
-                infectee = population.select(infector=self.kwargs['by'])
-
-                if not infectee:
-                    self.logger.write(
-                        f'{self.logger.id}\t{self.time:.2f}\t{EventType.INFECTION_FAILED.name}\t{self.target}\tby={self.kwargs["by"]},reson=no_infectee\n'
-                    )
-                    return []
-            #
-            return population[infectee].infect(self.time, **self.kwargs)
+            evts = self._infect(population)
+            # schedule the next infection of a lazily scheduled infector
+            schedule = self.kwargs.get('schedule', None)
+            if schedule is not None:
+                evt = schedule.next_event()
+                if evt is not None:
+                    evts.append(evt)
+            return evts
         elif self.action == EventType.QUARANTINE:
             if self.target not in population:
                 self.logger.write(
-                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.WARNING.name}\t{self.target}\tmsg=QUARANTINE target no longer exists\n'
+                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.WARNING.name}\t{population.id(self.target)}\tmsg=QUARANTINE target no longer exists\n'
                 )
                 return []
             self.logger.write(
-                f'{self.logger.id}\t{self.time:.2f}\t{EventType.QUARANTINE.name}\t{self.target}\ttill={self.kwargs["till"]:.2f}\n'
+                f'{self.logger.id}\t{self.time:.2f}\t{EventType.QUARANTINE.name}\t{population.id(self.target)}\ttill={self.kwargs["till"]:.2f}\n'
             )
+            # infections scheduled during quarantine are not cancelled
+            # because the quarantine can be shortened by another quarantine,
+            # and are avoided in _infect if they happen during quarantine
             return population[self.target].quarantine(**self.kwargs)
         elif self.action == EventType.REINTEGRATION:
             if self.target not in population:
                 self.logger.write(
-                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.WARNING.name}\t{self.target}\tmsg=REINTEGRATION target no longer exists\n'
+                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.WARNING.name}\t{population.id(self.target)}\tmsg=REINTEGRATION target no longer exists\n'
                 )
                 return []
             else:
                 self.logger.write(
-                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.REINTEGRATION.name}\t{self.target}\tsucc=True\n'
+                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.REINTEGRATION.name}\t{population.id(self.target)}\tsucc=True\n'
                 )
                 return population[self.target].reintegrate(**self.kwargs)
         elif self.action == EventType.INFECTION_AVOIDED:
             self.logger.write(
-                f'{self.logger.id}\t{self.time:.2f}\t{EventType.INFECTION_AVOIDED.name}\t.\tby={self.kwargs["by"]}\n'
+                f'{self.logger.id}\t{self.time:.2f}\t{EventType.INFECTION_AVOIDED.name}\t.\tby={population.id(self.kwargs["by"])}\n'
             )
             return []
         elif self.action == EventType.SHOW_SYMPTOM:
             if self.target in population:
                 population[self.target].show_symptom = self.time
                 self.logger.write(
-                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.SHOW_SYMPTOM.name}\t{self.target}\t.\n'
+                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.SHOW_SYMPTOM.name}\t{population.id(self.target)}\t.\n'
                 )
             else:
                 self.logger.write(
-                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.WARNING.name}\t{self.target}\tmsg=SHOW_SYMPTOM target no longer exists\n'
+                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.WARNING.name}\t{population.id(self.target)}\tmsg=SHOW_SYMPTOM target no longer exists\n'
                 )
             return []
         elif self.action == EventType.REMOVAL:
             if self.target in population:
                 population.remove(self.target)
                 self.logger.write(
-                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.REMOVAL.name}\t{self.target}\tpopsize={len(population)}\n'
+                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.REMOVAL.name}\t{population.id(self.target)}\tpopsize={len(population)}\n'
                 )
             else:
                 self.logger.write(
-                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.WARNING.name}\t{self.target}\tmsg=REMOVAL target no longer exists\n'
+                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.WARNING.name}\t{population.id(self.target)}\tmsg=REMOVAL target no longer exists\n'
                 )
             return []
         elif self.action == EventType.RECOVER:
@@ -153,31 +144,95 @@ class Event(object):
                 population[self.target].recovered = self.time
             else:
                 self.logger.write(
-                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.WARNING.name}\t{self.target}\tmsg=RECOVER target no longer exists\n'
+                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.WARNING.name}\t{population.id(self.target)}\tmsg=RECOVER target no longer exists\n'
                 )
                 return []
 
-            n_recovered = len([
-                x for x, ind in population.items()
-                if ind.recovered not in (False, None)
-            ])
-            n_infected = len([
-                x for x, ind in population.items()
-                if ind.infected not in (False, None)
-            ])
             params = dict(
-                recovered=n_recovered,
-                infected=n_infected,
+                recovered=population.n_recovered,
+                infected=population.n_infected,
                 popsize=len(population))
             if removed:
                 params[removed] = True
             param = ','.join(f'{x}={y}' for x, y in params.items())
             self.logger.write(
-                f'{self.logger.id}\t{self.time:.2f}\t{EventType.RECOVER.name}\t{self.target}\t{param}\n'
+                f'{self.logger.id}\t{self.time:.2f}\t{EventType.RECOVER.name}\t{population.id(self.target)}\t{param}\n'
             )
             return []
         else:
             raise RuntimeError(f'Unrecognized action {self.action}')
 
+    def _infect(self, population):
+        if 'by' not in self.kwargs:
+            raise ValueError('Parameter by is required for INECTION event.')
+
+        if self.kwargs['by'] is not None:
+            # if infector is removed or quarantined
+            if self.kwargs['by'] not in population:
+                self.logger.write(
+                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.INFECTION_AVOIDED.name}\t.\tby={population.id(self.kwargs["by"])},reason=REMOVED\n'
+                )
+                return []
+            #
+            by_ind = population[self.kwargs['by']]
+            if by_ind.quarantined and by_ind.quarantined >= self.time:
+                self.logger.write(
+                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.INFECTION_AVOIDED.name}\t.\tby={by_ind.id},reason=QUARANTINED\n'
+                )
+                return []
+
+        # determin einfectee
+        if self.target is not None:
+            # if the target is preselected (e.g. through init plugin or infector)
+            if self.target not in population:
+                self.logger.write(
+                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.WARNING.name}\t{population.id(self.target)}\tmsg=INFECTION target no longer exists\n'
+                )
+                return []
+            infectee = self.target
+        else:
+            # select infectee from the population, subject to vicinity of infector
+            infectee = population.select(infector=self.kwargs['by'])
+
+            if infectee is None:
+                self.logger.write(
+                    f'{self.logger.id}\t{self.time:.2f}\t{EventType.INFECTION_FAILED.name}\t{population.id(self.target)}\tby={population.id(self.kwargs["by"])},reson=no_infectee\n'
+                )
+                return []
+        #
+        kwargs = {x: y for x, y in self.kwargs.items() if x != 'schedule'}
+        return population[infectee].infect(self.time, **kwargs)
+
     def __str__(self):
         return f'{self.action.name}_{self.target if self.target is not None else ""}_at_{self.time:.2f}'
+
+
+class InfectionSchedule(object):
+    '''
+    Future infections of an infector, used when infections are scheduled
+    lazily. Only the next infection is queued as an INFECTION event, which
+    refers to the schedule through its parameter "schedule", and the
+    following infection is created when the event is applied.
+    '''
+    __slots__ = ('times', 'pos', 'logger', 'kwargs')
+
+    def __init__(self, times, logger, kwargs):
+        # times of infections in increasing order
+        self.times = times
+        self.pos = 0
+        self.logger = logger
+        self.kwargs = kwargs
+
+    def next_event(self):
+        '''Return the next INFECTION event, or None if there is no more
+        infection.'''
+        if self.pos >= len(self.times):
+            return None
+        self.pos += 1
+        return Event.with_shared_kwargs(self.times[self.pos - 1],
+                                        EventType.INFECTION, None, self.logger,
+                                        self.kwargs)
+
+    def __len__(self):
+        # number of infections that are not yet scheduled
+        return len(self.times) - self.pos
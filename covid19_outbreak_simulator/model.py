@@ -1,9 +1,11 @@
+import math
 import os
 import re
 
 import numpy as np
 import pandas as pd
 from scipy.optimize import bisect
+from scipy.special import ndtr, ndtri
 from scipy.stats import norm
 from covid19_outbreak_simulator.utils import as_float, as_int
 from fnmatch import fnmatch
@@ -377,14 +379,172 @@ class Params:
         self.set_prop_asym_carriers(args.prop_asym_carriers)
 
 
+def norm_pdf(x, loc, scale):
+    # density of normal distribution, which is much faster than pdf of a
+    # frozen scipy.stats.norm for arrays of a few hundred values. Like
+    # scipy, NaN is returned for scale 0.
+    if scale <= 0:
+        return np.full(np.shape(x), np.nan)
+    z = (np.asarray(x) - loc) / scale
+    return np.exp(-z * z / 2) / (math.sqrt(2 * math.pi) * scale)
+
+
+class KernelLibrary(object):
+    """
+    Transmission probabilities with R0=1 (kernels), which depend only on the
+    transmissibility models, interval of simulation, incubation period and
+    duration of infection, and are multiplied by R0 of individuals. Kernels
+    are computed on demand for points of a grid of incubation periods and
+    durations, and are kept for the lifetime of the process so that all
+    replicates simulated by a worker share the same kernels. The library
+    is cleared when it has max_size kernels, which limits its memory usage
+    with fine grids.
+    """
+
+    def __init__(self, max_size=10000):
+        self.kernels = {}
+        self.max_size = max_size
+
+    def get(self, key, compute):
+        kernel = self.kernels.get(key, None)
+        if kernel is None:
+            if len(self.kernels) >= self.max_size:
+                self.kernels.clear()
+            kernel = compute()
+            self.kernels[key] = kernel
+        return kernel
+
+    def __len__(self):
+        return len(self.kernels)
+
+
+# kernels shared by all models of the process
+kernel_library = KernelLibrary()
+
+
+class ContinuousKernel(object):
+    """
+    Transmission probabilities with R0=1 as a density in continuous time
+    since infection, with total probability 1 over [0, duration]. Derived
+    classes provide the distribution function cdf(x) and its inverse
+    ppf(u) so that times of infections are drawn without a grid of time
+    points, and the cost of drawing does not depend on the interval of
+    simulation.
+    """
+
+    def sample(self, R0, start=0, stop=None):
+        """Sorted times of infections in [start, stop), with a Poisson number
+        of infections with mean R0 times the probability of the interval."""
+        if stop is None:
+            stop = self.duration
+        lower = self.cdf(start)
+        upper = self.cdf(stop)
+        if upper <= lower:
+            return np.zeros(0)
+        count = np.random.poisson(R0 * (upper - lower))
+        return np.sort(self.ppf(np.random.uniform(lower, upper, count)))
+
+
+class TriangularKernel(ContinuousKernel):
+    """
+    Piecewise transmissibility that is zero before start, increases linearly
+    to peak, and decreases linearly to zero at duration, which has a
+    closed-form inverse distribution function.
+    """
+
+    def __init__(self, start, peak, duration):
+        self.start = start
+        self.peak = min(max(peak, start), duration)
+        self.duration = duration
+        # probability before peak
+        self.p_peak = (self.peak - start) / (duration - start)
+
+    def cdf(self, x):
+        a, c, b = self.start, self.peak, self.duration
+        if x <= a:
+            return 0.0
+        if x >= b:
+            return 1.0
+        if x < c:
+            return (x - a) ** 2 / ((b - a) * (c - a))
+        return 1 - (b - x) ** 2 / ((b - a) * (b - c))
+
+    def ppf(self, u):
+        a, c, b = self.start, self.peak, self.duration
+        return np.where(
+            u < self.p_peak,
+            a + np.sqrt(u * (b - a) * (c - a)),
+            b - np.sqrt((1 - u) * (b - a) * (b - c)),
+        )
+
+
+class NormalMixtureKernel(ContinuousKernel):
+    """
+    Transmissibility of the normal models, as a mixture of normal densities
+    that are truncated to consecutive intervals. Each piece is specified as
+    (lower, upper, loc, scale, weight), with density weight * pdf(x, loc,
+    scale) / pdf(loc, loc, scale) so that pieces of the same weight have the
+    same height at loc.
+    """
+
+    def __init__(self, pieces, duration):
+        self.duration = duration
+        self.pieces = [
+            (lower, upper, loc, scale, weight * scale,
+             ndtr((lower - loc) / scale), ndtr((upper - loc) / scale))
+            for lower, upper, loc, scale, weight in pieces
+        ]
+        masses = np.array([x[4] * (x[6] - x[5]) for x in self.pieces])
+        self.total = masses.sum()
+        # probability at the end of each piece
+        self.cum_prob = np.cumsum(masses) / self.total
+
+    def cdf(self, x):
+        res = 0.0
+        for lower, upper, loc, scale, weight, p_lower, p_upper in self.pieces:
+            if x <= lower:
+                break
+            p_x = p_upper if x >= upper else ndtr((x - loc) / scale)
+            res += weight * (p_x - p_lower)
+        return min(1.0, res / self.total)
+
+    def ppf(self, u):
+        u = np.asarray(u, dtype=float)
+        piece = np.minimum(np.searchsorted(self.cum_prob, u, side="right"),
+            len(self.pieces) - 1)
+        res = np.empty(len(u))
+        for i, (lower, upper, loc, scale, weight, p_lower, p_upper) in enumerate(self.pieces):
+            selected = piece == i
+            start = self.cum_prob[i - 1] if i > 0 else 0.0
+            p = p_lower + (u[selected] - start) * self.total / weight
+            res[selected] = np.clip(loc + scale * ndtri(np.clip(p, p_lower, p_upper)),
+                lower, upper)
+        return res
+
+
 class Model(object):
 
     sd_5 = bisect(lambda x: norm.cdf(10, loc=5, scale=x) - 0.995, a=0.001, b=5)
     sd_6 = bisect(lambda x: norm.cdf(14, loc=6, scale=x) - 0.975, a=0.001, b=5)
+    z_99 = norm.ppf(0.99)
 
-    def __init__(self, params):
+    def __init__(self, params, lazy_schedule=False, kernel_tolerance=None,
+            verify_kernels=False, infection_sampler='bernoulli'):
         self.params = params
         self.params.prop_asym_carriers = None
+        # if only the next infection of each infector is scheduled
+        self.lazy_schedule = lazy_schedule
+        # how infections are drawn from transmission probabilities
+        if infection_sampler not in ('bernoulli', 'thinning', 'poisson', 'continuous'):
+            raise ValueError(f'Unrecognized infection sampler {infection_sampler}')
+        self.infection_sampler = infection_sampler
+        # incubation periods and durations of infection are rounded to
+        # multiples of kernel_tolerance to look up kernels, and the largest
+        # difference between rounded and exact kernels is recorded as
+        # kernel_error if verify_kernels is set
+        self.kernel_tolerance = kernel_tolerance
+        self.verify_kernels = verify_kernels
+        self.kernel_error = 0.0
 
     def draw_prop_asym_carriers(self, group=""):
         self.params.prop_asym_carriers = np.random.normal(
@@ -476,6 +636,115 @@ class Model(object):
                     )
                 ]
 
+    def draw_infections(self, trans_prob):
+        """Number of infections at each time point with transmission
+        probabilities trans_prob. The "bernoulli" sampler draws one Bernoulli
+        variable for each time point. The "thinning" sampler draws the same
+        distribution with a cost proportional to the number of infections,
+        by drawing candidate points with the largest probability p_max
+        through geometric gaps between them, and keeping each candidate with
+        probability trans_prob / p_max. The "poisson" sampler approximates
+        the number of infections by a Poisson distribution with mean
+        sum(trans_prob), and draws times of infections from the normalized
+        transmission probabilities. The "continuous" sampler does not use
+        transmission probabilities on the grid, see get_continuous_kernel."""
+        if self.infection_sampler == "bernoulli":
+            return np.random.binomial(1, trans_prob, len(trans_prob))
+        n = len(trans_prob)
+        infected = np.zeros(n, dtype=int)
+        if n == 0:
+            return infected
+        if self.infection_sampler == "thinning":
+            p_max = trans_prob.max()
+            if p_max <= 0:
+                return infected
+            if p_max > 1:
+                raise ValueError(f"Transmission probability {p_max} is larger than 1")
+            size = int(n * p_max + 4 * math.sqrt(n * p_max)) + 4
+            points = np.cumsum(np.random.geometric(p_max, size)) - 1
+            while points[-1] < n:
+                points = np.concatenate(
+                    [points, points[-1] + np.cumsum(np.random.geometric(p_max, size))]
+                )
+            points = points[points < n]
+            keep = np.random.uniform(size=len(points)) * p_max < trans_prob[points]
+            infected[points[keep]] = 1
+        else:
+            cum_prob = np.cumsum(trans_prob)
+            count = np.random.poisson(cum_prob[-1])
+            if count:
+                points = np.searchsorted(cum_prob, np.random.uniform(0, cum_prob[-1], count),
+                    side="right")
+                infected = np.bincount(np.minimum(points, n - 1), minlength=n)
+        return infected
+
+    def get_transmission_kernel(self, symptomatic, incu, params):
+        """Time points and transmission probabilities with R0=1, which are
+        multiplied by R0 to get transmission probabilities. incu is ignored
+        for asymptomatic cases. If kernel_tolerance is specified, kernels
+        are looked up from kernel_library with incu and params rounded to
+        the nearest multiples of kernel_tolerance."""
+        if not symptomatic:
+            incu = None
+        if self.kernel_tolerance is None:
+            # exact random incubation periods and durations are not reused
+            return self._compute_kernel(symptomatic, incu, params)
+
+        def on_grid(x):
+            # nearest point on the grid, which is at least one step
+            return max(1, round(x / self.kernel_tolerance)) * self.kernel_tolerance
+
+        kernel = self._lookup_kernel(symptomatic,
+            None if incu is None else on_grid(incu), [on_grid(x) for x in params])
+        if self.verify_kernels:
+            exact = self._compute_kernel(symptomatic, incu, params)[1]
+            size = max(len(exact), len(kernel[1]))
+            error = np.abs(np.pad(kernel[1], (0, size - len(kernel[1]))) -
+                np.pad(exact, (0, size - len(exact)))).max()
+            self.kernel_error = max(self.kernel_error, error)
+        return kernel
+
+    def get_continuous_kernel(self, symptomatic, incu, params):
+        """Transmission probabilities with R0=1 in continuous time, which
+        are used by the "continuous" sampler to draw times of infections.
+        incu is ignored for asymptomatic cases."""
+        if symptomatic:
+            transmissibility_model = self.params.symptomatic_transmissibility_model
+            if transmissibility_model["name"] == "normal":
+                # normal on the right side, and normal with sd_left on the
+                # left side of 2/3 of incubation period, of the same height
+                incu = incu * 2 / 3
+                pieces = [(incu, incu + params[0], incu, self.sd_6, 1.0)]
+                if incu > 0:
+                    pieces.insert(0, (0, incu, incu, incu / self.z_99, 1.0))
+                return NormalMixtureKernel(pieces, incu + params[0])
+            scale = incu
+            duration = incu + params[0]
+        else:
+            transmissibility_model = self.params.asymptomatic_transmissibility_model
+            if transmissibility_model["name"] == "normal":
+                return NormalMixtureKernel([(0, params[0], 4.8, self.sd_5, 1.0)], params[0])
+            scale = params[0]
+            duration = params[0]
+        return TriangularKernel(
+            scale * transmissibility_model["noninfectivity_proportion"],
+            scale * transmissibility_model["peak_proportion"],
+            duration,
+        )
+
+    def _lookup_kernel(self, symptomatic, incu, params):
+        transmissibility_model = (self.params.symptomatic_transmissibility_model
+            if symptomatic else self.params.asymptomatic_transmissibility_model)
+        key = (symptomatic, incu, tuple(params), self.params.simulation_interval,
+            tuple(sorted(transmissibility_model.items())))
+        return kernel_library.get(key,
+            lambda: self._compute_kernel(symptomatic, incu, params))
+
+    def _compute_kernel(self, symptomatic, incu, params):
+        if symptomatic:
+            return self.get_symptomatic_transmission_probability(incu, 1, params)
+        return self.get_asymptomatic_transmission_probability(1, params)
+
     def get_symptomatic_transmission_probability(self, incu, R0, params):
         if self.params.symptomatic_transmissibility_model["name"] == "normal":
             return self.get_normal_symptomatic_transmission_probability(
@@ -514,7 +783,6 @@ class Model(object):
         """
         # right side with 6 day interval
         incu = incu * 2 / 3
-        dist_right = norm(incu, self.sd_6)
 
         # if there is no left-hand-side
         if incu <= self.params.simulation_interval:
@@ -523,21 +791,15 @@ class Model(object):
                 incu + params[0],
                 int((incu + params[0]) / self.params.simulation_interval),
             )
-            y = dist_right.pdf(x)
+            y = norm_pdf(x, incu, self.sd_6)
         else:
-            # left hand side with a incu day interval
-            try:
-                sd_left = bisect(
-                    lambda x: norm.cdf(2 * incu, loc=incu, scale=x) - 0.99,
-                    a=0.001,
-                    b=15,
-                    xtol=0.001,
-                )
-            except:
-                # if incubation period is zer0
+            # left hand side with a incu day interval, with sd_left solved
+            # from norm.cdf(2 * incu, loc=incu, scale=sd_left) = 0.99
+            sd_left = incu / self.z_99
+            if sd_left > 15:
+                # out of the range of the original numeric solution
                 sd_left = 0.0
-            dist_left = norm(incu, sd_left)
-            scale = dist_right.pdf(incu) / dist_left.pdf(incu)
+            scale = norm_pdf(incu, incu, self.sd_6) / norm_pdf(incu, incu, sd_left)
 
             x = np.linspace(
                 0,
@@ -546,7 +808,7 @@ class Model(object):
             )
             idx = int(incu / self.params.simulation_interval)
             y = np.concatenate(
-                [dist_left.pdf(x[:idx]) * scale, dist_right.pdf(x[idx:])]
+                [norm_pdf(x[:idx], incu, sd_left) * scale, norm_pdf(x[idx:], incu, self.sd_6)]
             )
         return x, y / sum(y) * R0
 
@@ -622,9 +884,8 @@ class Model(object):
         y
             probability of transmission for each time point
         """
-        dist = norm(4.8, self.sd_5)
         x = np.linspace(0, params[0], int(params[0] / self.params.simulation_interval))
-        y = dist.pdf(x)
+        y = norm_pdf(x, 4.8, self.sd_5)
         return x, y / sum(y) * R0
 
     def get_piecewise_asymptomatic_transmissibility_probability(self, R0, params):
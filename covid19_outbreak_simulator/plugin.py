@@ -4,6 +4,7 @@ from covid19_outbreak_simulator.event import EventType
 
 
 class PlugInEvent(object):
+    __slots__ = ('time', 'plugin', 'args', 'priority', 'action', 'trigger_event')
 
     def __init__(self, time, plugin, args, priority=False, trigger_event=None):
         self.time = time
@@ -140,9 +141,17 @@ class BasePlugin(object):
         # redefined by subclassed
         raise ValueError('This function should be redefined.')
 
-    def apply_plugin(self, time, population, args=None):
+    def apply_vectorized(self, time, population, args=None):
+        # redefined by plugins that support the vectorized engine, in which
+        # case population is a VectorizedPopulation
+        raise ValueError(f'Plugin {self} does not support the vectorized engine.')
 
-        events = self.apply(time, population, args)
+    def apply_plugin(self, time, population, args=None, vectorized=False):
+
+        if vectorized:
+            events = self.apply_vectorized(time, population, args)
+        else:
+            events = population.resolve(self.apply(time, population, args))
 
         # schedule the next call
         if args.interval is not None and (args.end is None or
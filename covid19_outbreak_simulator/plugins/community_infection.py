@@ -43,23 +43,25 @@ class community_infection(BasePlugin):
             subpops=population.group_sizes.keys())
 
         for subpop, prob in probability.items():
+            if subpop not in population.group_codes:
+                continue
             # drawning random number one by one
             events += [
                 Event(
                     time,
                     EventType.INFECTION,
-                    target=id,
+                    target=row,
                     logger=self.logger,
                     priority=True,
                     by=None,
                     leadtime=0,
                     handle_symptomatic=self.simulator.simu_args
                     .handle_symptomatic)
-                for id, ind in population.individuals.items()
-                if population[id].group == subpop and not population[id].quarantined and np.random.binomial(1,
-                    min(1, prob * ind.susceptibility), 1)[0]
+                for row in population.members(subpop).tolist()
+                if not population.is_quarantined(row) and np.random.binomial(1,
+                    min(1, prob * population.susceptibility(row)), 1)[0]
             ]
-        IDs = [x.target for x in events]
+        IDs = population.ids_of(x.target for x in events)
         ID_list = f',infected={",".join(IDs)}' if IDs and args.verbosity > 1 else ''
 
         if args.verbosity > 0:
@@ -67,3 +69,26 @@ class community_infection(BasePlugin):
                 f'{self.logger.id}\t{time:.2f}\t{EventType.PLUGIN.name}\t.\tname=community_infection,n_infected={len(events)}{ID_list}\n'
             )
         return events
+
+    def apply_vectorized(self, time, population, args=None):
+        probability = parse_param_with_multiplier(args.probability,
+            subpops=population.names)
+
+        infected = []
+        for subpop, prob in probability.items():
+            if subpop not in population.names:
+                continue
+            idxs = population.members(population.names.index(subpop))
+            idxs = idxs[np.isnan(population.quarantined[idxs])]
+            infected.extend(idxs[np.random.uniform(size=len(idxs)) <
+                np.minimum(1, prob * population.susceptibility[idxs])])
+
+        for rep, logger, idxs in population.split(infected):
+            IDs = population.ids(idxs)
+            ID_list = f',infected={",".join(IDs)}' if IDs and args.verbosity > 1 else ''
+            if args.verbosity > 0:
+                logger.write(
+                    f'{logger.id}\t{time:.2f}\t{EventType.PLUGIN.name}\t.\tname=community_infection,n_infected={len(idxs)}{ID_list}\n'
+                )
+        population.infect(infected, time, leadtime=0)
+        return []
@@ -83,18 +83,17 @@ class init(BasePlugin):
 
                 n_ir += sp_ir
                 n_isp += sp_isp
-                for idx, sts in zip(range(0, sz), pop_status):
+                for row, sts in zip(population.members(name).tolist(), pop_status):
                     if sts == 2:
-                        population[f'{name}_{idx}' if name else str(idx)].infected = -10.0
-                        population[f'{name}_{idx}' if name else str(idx)].recovered = -2.0
+                        population.set_field(row, 'infected', -10.0)
+                        population.set_field(row, 'recovered', -2.0)
                     if sts == 1:
-                        ID = f'{name}_{idx}' if name else str(idx)
-                        infected.append(ID)
+                        infected.append(row)
                         events.append(
                             Event(
                                 0.0,
                                 EventType.INFECTION,
-                                target=ID,
+                                target=row,
                                 logger=self.logger,
                                 priority=True,
                                 by=None,
@@ -112,16 +111,15 @@ class init(BasePlugin):
                 pop_isp = min(pop_isp, 1 - pop_ir)
 
                 pop_rng = np.random.uniform(0, 1, sz)
-                for idx, rng in zip(range(0, sz), pop_rng):
+                for row, rng in zip(population.members(name).tolist(), pop_rng):
                     if rng < pop_ir:
                         n_ir += 1
-                        ID = f'{name}_{idx}' if name else str(idx)
-                        infected.append(ID)
+                        infected.append(row)
                         events.append(
                             Event(
                                 0.0,
                                 EventType.INFECTION,
-                                target=ID,
+                                target=row,
                                 logger=self.logger,
                                 priority=True,
                                 by=None,
@@ -130,12 +128,50 @@ class init(BasePlugin):
                                 .handle_symptomatic))
                     elif rng < pop_ir + pop_isp:
                         n_isp += 1
-                        population[f'{name}_{idx}' if name else str(idx)].infected = -10.0
-                        population[f'{name}_{idx}' if name else str(idx)].recovered = -2.0
-        infected_list = f',infected={",".join(infected)}' if infected and args.verbosity > 1 else ""
+                        population.set_field(row, 'infected', -10.0)
+                        population.set_field(row, 'recovered', -2.0)
+        infected_list = f',infected={",".join(population.ids_of(infected))}' if infected and args.verbosity > 1 else ""
         if args.verbosity > 0:
             self.logger.write(
                 f'{self.logger.id}\t{time:.2f}\t{EventType.PLUGIN.name}\t.\tname=init,n_recovered={n_isp},n_infected={n_ir}{infected_list}\n'
             )
 
         return events
+
+    def apply_vectorized(self, time, population, args=None):
+        ir = parse_param_with_multiplier(args.incidence_rate,
+                subpops=population.names, default=0.0)
+        isp = parse_param_with_multiplier(args.seroprevalence,
+                subpops=population.names, default=0.0)
+
+        infected = []
+        recovered = []
+        for rep in np.flatnonzero(population.running):
+            for grp, name in enumerate(population.names):
+                idxs = rep * population.size + np.arange(population.offsets[grp], population.offsets[grp + 1])
+                sz = len(idxs)
+                pop_ir = ir.get(name if name in ir else '', 0.0)
+                pop_isp = isp.get(name if name in isp else '', 0.0)
+                if args.as_proportion:
+                    sp_ir = int(sz * pop_ir)
+                    sp_isp = min(int(sz * pop_isp), sz - sp_ir)
+                    idxs = np.random.permutation(idxs)
+                    infected.extend(idxs[:sp_ir])
+                    recovered.extend(idxs[sp_ir:sp_ir + sp_isp])
+                else:
+                    pop_isp = min(pop_isp, 1 - pop_ir)
+                    pop_rng = np.random.uniform(0, 1, sz)
+                    infected.extend(idxs[pop_rng < pop_ir])
+                    recovered.extend(idxs[(pop_rng >= pop_ir) & (pop_rng < pop_ir + pop_isp)])
+        population.set_recovered(recovered)
+
+        n_recovered = np.bincount(np.asarray(recovered, dtype=np.int64) // population.size,
+            minlength=population.replicates)
+        for rep, logger, idxs in population.split(infected):
+            infected_list = f',infected={",".join(population.ids(idxs))}' if len(idxs) and args.verbosity > 1 else ""
+            if args.verbosity > 0:
+                logger.write(
+                    f'{logger.id}\t{time:.2f}\t{EventType.PLUGIN.name}\t.\tname=init,n_recovered={n_recovered[rep]},n_infected={len(idxs)}{infected_list}\n'
+                )
+        population.infect(infected, time, leadtime=args.leadtime)
+        return []
@@ -49,36 +49,38 @@ class insert(BasePlugin):
             if name not in population.group_sizes:
                 raise ValueError(f'can only add to existing groups')
 
-            IDs = [f'{name}_{idx}' if name else str(idx) for idx in range(
-                        population.max_ids[name], population.max_ids[name] + sz)]
-            population.add([
+            # new individuals are numbered by the population
+            individuals = [
                 Individual(
-                    ID,
+                    None,
                     susceptibility=getattr(self.simulator.model.params,
                                            f'susceptibility_mean',
                                            1) * getattr(self.simulator.model.params,
                                            f'susceptibility_multiplier_{name}',
                                            1),
                     model=self.simulator.model,
-                    logger=self.logger) for ID in IDs
-            ], subpop=name)
+                    logger=self.logger) for idx in range(sz)
+            ]
+            population.add(individuals, subpop=name)
+            rows = [x.row for x in individuals]
 
             n_infected = int(sz * args.prop_of_infected)
-            random.shuffle(IDs)
-            infected = IDs[:n_infected]
-            for ID in infected:
+            random.shuffle(rows)
+            infected = rows[:n_infected]
+            for row in infected:
                 events.append(
                     Event(
                         time,
                         EventType.INFECTION,
-                        target=ID,
+                        target=row,
                         logger=self.logger,
                         by=None,
                         handle_symptomatic=self.simulator.simu_args
                         .handle_symptomatic,
                         leadtime=args.leadtime))
-            infected_list = f',Infected={",".join(infected)}' if args.verbosity > 1 else ''
+            infected_list = f',Infected={",".join(population.ids_of(infected))}' if args.verbosity > 1 else ''
             if args.verbosity > 0:
+                IDs = population.ids_of(x.row for x in individuals)
                 self.logger.write(f'{self.logger.id}\t{time:.2f}\t{EventType.PLUGIN.name}\t.\tname=insert,subpop={name},size={sz},n_infected={n_infected},IDs={",".join(IDs)}{infected_list}\n')
 
         return events
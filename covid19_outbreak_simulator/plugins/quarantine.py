@@ -4,6 +4,8 @@ from covid19_outbreak_simulator.utils import parse_param_with_multiplier
 
 import random
 
+import numpy as np
+
 class quarantine(BasePlugin):
 
     def __init__(self, *args, **kwargs):
@@ -54,11 +56,11 @@ class quarantine(BasePlugin):
             for name, sz in population.group_sizes.items():
                 prop = proportions.get(name if name in proportions else '', 1.0)
 
-                if args.target == 'all':
-                    spIDs = [x.id for x in population.individuals.values() if name == '' or x.group == name]
-                else:
-                    spIDs = [x.id for x in population.individuals.values() if (name == '' or x.group == name) and
-                        isinstance(x.infected, float) and not isinstance(x.recovered, float)]
+                rows = population.members(name or None)
+                if args.target != 'all':
+                    rows = rows[~np.isnan(population.infected[rows]) &
+                        np.isnan(population.recovered[rows])]
+                spIDs = population.ids_of(rows)
 
                 if prop < 1:
                     random.shuffle(spIDs)
@@ -80,3 +82,44 @@ class quarantine(BasePlugin):
             self.logger.write(f'{self.logger.id}\t{time:.2f}\t{EventType.PLUGIN.name}\t.\tname=quarantine,n_quarantined={len(IDs)}{quarantined_list}\n')
 
         return events
+
+    def apply_vectorized(self, time, population, args=None):
+        if args.IDs:
+            if args.proportion:
+                raise ValueError('Proportion is now allowed if specific IDs to quarantine is specified.')
+            try:
+                idxs = np.array([population.index(x, rep)
+                    for rep in np.flatnonzero(population.running)
+                    for x in args.IDs], dtype=np.int64)
+            except ValueError:
+                raise ValueError('Invalid or non-existant ID to quarantine.')
+            if not population.present[idxs].all():
+                raise ValueError('Invalid or non-existant ID to quarantine.')
+            if args.target == 'infected':
+                idxs = idxs[~np.isnan(population.infected[idxs]) & np.isnan(population.recovered[idxs])]
+        else:
+            proportions = parse_param_with_multiplier(args.proportion,
+                subpops=population.names, default=1.0)
+
+            idxs = []
+            for rep in np.flatnonzero(population.running):
+                for grp, name in enumerate(population.names):
+                    sz = population.group_sizes[rep, grp]
+                    prop = proportions.get(name if name in proportions else '', 1.0)
+                    spIdxs = rep * population.size + np.arange(population.offsets[grp], population.offsets[grp + 1])
+                    spIdxs = spIdxs[population.present[spIdxs]]
+                    if args.target != 'all':
+                        spIdxs = spIdxs[~np.isnan(population.infected[spIdxs]) & np.isnan(population.recovered[spIdxs])]
+
+                    if prop < 1:
+                        idxs.extend(np.random.permutation(spIdxs)[:int(sz * prop)])
+                    else:
+                        idxs.extend(spIdxs)
+
+        for rep, logger, repIdxs in population.split(idxs):
+            quarantined_list = f',Quarantined={",".join(population.ids(repIdxs))}' if args.verbosity > 1 else ''
+            if args.verbosity > 0:
+                logger.write(f'{logger.id}\t{time:.2f}\t{EventType.PLUGIN.name}\t.\tname=quarantine,n_quarantined={len(repIdxs)}{quarantined_list}\n')
+
+        population.quarantine(idxs, time, time + args.duration)
+        return []
@@ -34,11 +34,12 @@ class remove(BasePlugin):
             if name not in population.group_sizes:
                 raise ValueError(f'Subpopulation {name} does not exist')
 
-            IDs = [x for x in population.ids if x.startswith(name) and x[len(name):].isnumeric()]
-            random.shuffle(IDs)
-            for ID in IDs[:sz]:
-                population.remove(ID)
-            removed_list = f',removed={",".join(IDs[:sz])}' if args.verbosity > 1 else ''
+            rows = population.members(name).tolist()
+            random.shuffle(rows)
+            removed = population.ids_of(rows[:sz])
+            for row in rows[:sz]:
+                population.remove(row)
+            removed_list = f',removed={",".join(removed)}' if args.verbosity > 1 else ''
             if args.verbosity > 0:
                 self.logger.write(f'{self.logger.id}\t{time:.2f}\t{EventType.PLUGIN.name}\t.\tname=remove,subpop={name},size={sz}{removed_list}\n')
         return events
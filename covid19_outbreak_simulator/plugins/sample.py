@@ -1,5 +1,7 @@
 import random
 
+import numpy as np
+
 from covid19_outbreak_simulator.plugin import BasePlugin
 from covid19_outbreak_simulator.event import EventType
 
@@ -38,17 +40,11 @@ class sample(BasePlugin):
         # draw a random sample
         samples = [1] * sz + [0] * (len(population) - sz)
         random.shuffle(samples)
+        rows = population.members()[np.array(samples, dtype=bool)]
 
-        stat['n_recovered'] = len([
-            x for s, (x, ind) in zip(samples, population.items())
-            if isinstance(ind.recovered, float) and s
-        ])
-        stat['n_infected'] = len([
-            x for s, (x, ind) in zip(samples, population.items())
-            if ind.infected not in (False, None) and s
-        ])
-        stat['n_popsize'] = len(
-            [x for s, (x, ind) in zip(samples, population.items()) if s])
+        stat['n_recovered'] = int(np.count_nonzero(~np.isnan(population.recovered[rows])))
+        stat['n_infected'] = int(np.count_nonzero(~np.isnan(population.infected[rows])))
+        stat['n_popsize'] = len(rows)
         stat['incidence_rate'] = '0' if stat[
             'n_popsize'] == 0 else '{:.5f}'.format(
                 (stat['n_infected']) / stat['n_popsize'])
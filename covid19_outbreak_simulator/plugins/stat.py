@@ -1,3 +1,5 @@
+import numpy as np
+
 from covid19_outbreak_simulator.event import EventType
 from covid19_outbreak_simulator.plugin import BasePlugin
 
@@ -18,17 +20,46 @@ class stat(BasePlugin):
         return parser
 
     def apply(self, time, population, args=None):
+        counts = {}
+        counts[''] = (population.count('recovered'), population.count('infected'),
+                      population.count('popsize'))
+        for group in population.names:
+            if group == '' or not population.group_sizes[group]:
+                continue
+            counts[group] = (population.count('recovered', group),
+                             population.count('infected', group),
+                             population.count('popsize', group))
+        self.write_stat(time, counts, args, self.logger)
+        return []
+
+    def apply_vectorized(self, time, population, args=None):
+        shape = (population.replicates, population.size)
+        recovered = (population.present & ~np.isnan(population.recovered)).reshape(shape)
+        infected = (population.present & ~np.isnan(population.infected)).reshape(shape)
+        for rep in np.flatnonzero(population.running):
+            counts = {}
+            counts[''] = (int(np.count_nonzero(recovered[rep])),
+                          int(np.count_nonzero(infected[rep])),
+                          population.popsize(rep))
+            for idx, group in enumerate(population.names):
+                if group == '' or not population.group_sizes[rep, idx]:
+                    continue
+                grp = slice(population.offsets[idx], population.offsets[idx + 1])
+                counts[group] = (int(np.count_nonzero(recovered[rep, grp])),
+                                 int(np.count_nonzero(infected[rep, grp])),
+                                 int(population.group_sizes[rep, idx]))
+            self.write_stat(time, counts, args, population.loggers[rep])
+        return []
+
+    def write_stat(self, time, counts, args, logger):
+        # counts has number of recovered, infected individuals and popsize
+        # for the entire population ('') and each group
+        n_recovered, n_infected, n_popsize = counts['']
         res = {}
-        res[f'n_recovered'] = len([
-            x for x, ind in population.items()
-            if isinstance(ind.recovered, float)
-        ])
-        res[f'n_infected'] = len([
-            x for x, ind in population.items()
-        if isinstance(ind.infected, float)
-        ])
+        res[f'n_recovered'] = n_recovered
+        res[f'n_infected'] = n_infected
         res[f'n_active'] = res['n_infected'] - res['n_recovered']
-        res[f'n_popsize'] = len(population)
+        res[f'n_popsize'] = n_popsize
         res[f'incidence_rate'] = '0' if res[
             f'n_popsize'] == 0 else '{:.5f}'.format(res[f'n_active'] /
                                                     res[f'n_popsize'])
@@ -36,22 +67,14 @@ class stat(BasePlugin):
             f'n_popsize'] == 0 else '{:.5f}'.format(res[f'n_infected'] /
                                                     res[f'n_popsize'])
 
-        groups = set([x.group for x in population.values()])
-        for group in groups:
+        for group, (n_recovered, n_infected, n_popsize) in counts.items():
             if group == '':
                 continue
-            res[f'n_{group}_recovered'] = len([
-                x for x, ind in population.items()
-                if isinstance(ind.recovered, float) and ind.group == group
-            ])
-            res[f'n_{group}_infected'] = len([
-                x for x, ind in population.items()
-                if isinstance(ind.infected, float) and ind.group == group
-            ])
+            res[f'n_{group}_recovered'] = n_recovered
+            res[f'n_{group}_infected'] = n_infected
             res[f'n_{group}_active'] = res[f'n_{group}_infected'] - res[
                 f'n_{group}_recovered']
-            res[f'n_{group}_popsize'] = len(
-                [x for x, ind in population.items() if ind.group == group])
+            res[f'n_{group}_popsize'] = n_popsize
             res[f'{group}_incidence_rate'] = 0 if res[
                 f'n_{group}_popsize'] == '0' else '{:.3f}'.format(
                     res[f'n_{group}_active'] / res[f'n_{group}_popsize'])
@@ -60,8 +83,6 @@ class stat(BasePlugin):
                     res[f'n_{group}_infected'] / res[f'n_{group}_popsize'])
         param = ','.join(f'{k}={v}' for k, v in res.items())
         if args.verbosity > 0:
-            self.logger.write(
-                f'{self.logger.id}\t{time:.2f}\t{EventType.STAT.name}\t.\t{param}\n'
+            logger.write(
+                f'{logger.id}\t{time:.2f}\t{EventType.STAT.name}\t.\t{param}\n'
             )
-
-        return []
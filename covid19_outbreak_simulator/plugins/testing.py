@@ -69,7 +69,7 @@ class testing(BasePlugin):
         n_tested = 0
         n_false_negative_lod = 0
 
-        def select(ind, counts=None):
+        def select(row):
             nonlocal n_tested
             nonlocal n_infected
             nonlocal n_uninfected
@@ -79,21 +79,16 @@ class testing(BasePlugin):
             nonlocal n_false_negative_in_recovered
             nonlocal n_false_negative_lod
 
-            if counts:
-                if counts[ind.group] > 0:
-                    counts[ind.group] -= 1
-                else:
-                    return False
             n_tested += 1
-            affected = isinstance(ind.infected, float)
-            if affected:
+            # only infected individuals are accessed as Individual objects
+            if not numpy.isnan(population.infected[row]):
                 test_lod = args.sensitivity[1] if len(args.sensitivity) == 2 else 0
-                lod_sensitivity = ind.test_sensitivity(time, test_lod)
+                lod_sensitivity = population[row].test_sensitivity(time, test_lod)
                 #
                 sensitivity = lod_sensitivity * args.sensitivity[0]
                 res = sensitivity == 1 or sensitivity > numpy.random.uniform()
 
-                if isinstance(ind.recovered, float):
+                if not numpy.isnan(population.recovered[row]):
                     n_recovered += 1
                     if not res:
                         n_false_negative_in_recovered += 1
@@ -113,15 +108,26 @@ class testing(BasePlugin):
                 return res
 
         if args.IDs:
-            IDs = [x for x in args.IDs if select(population[x])]
+            # rows of IDs are tested so that uninfected individuals are not
+            # accessed as Individual objects
+            for x in args.IDs:
+                if x not in population:
+                    raise KeyError(x)
+            IDs = [
+                x for x in [population.row(x) for x in args.IDs]
+                if select(x)
+            ]
         else:
             proportions = parse_param_with_multiplier(args.proportion,
                 subpops=population.group_sizes.keys(), default=1.0)
-            counts = {name:int(size*proportions[name]) for name,size in population.group_sizes.items()}
+            # test the first individuals of each group
+            rows = numpy.sort(numpy.concatenate([
+                population.members(name)[:int(size*proportions[name])]
+                for name,size in population.group_sizes.items()]))
 
             IDs = [
-                x for x, y in population.items()
-                if select(y, counts)
+                x for x in rows.tolist()
+                if select(x)
             ]
 
         #print(f'SELECT {" ".join(IDs)}')
@@ -139,7 +145,7 @@ class testing(BasePlugin):
                     duration = 14
                 else:
                     duration = int(args.handle_positive.split('_', 1)[1])
-                if not population[ID].quarantined:
+                if not population.is_quarantined(ID):
                     events.append(
                         Event(
                             time + args.turnaround_time,
@@ -163,7 +169,7 @@ class testing(BasePlugin):
             n_false_negative_in_recovered=n_false_negative_in_recovered
         )
         if IDs and args.verbosity > 1:
-            res['detected_IDs'] = ",".join(IDs)
+            res['detected_IDs'] = ",".join(population.ids_of(IDs))
         res_str = ','.join(f'{k}={v}' for k,v in res.items())
         if args.verbosity > 0:
             self.logger.write(
@@ -1,34 +1,155 @@
 import copy
+import heapq
 import math
 import numpy as np
-from numpy.random import choice, rand
+from numpy.random import rand
 from fnmatch import fnmatch
-from .utils import as_float
-from .event import Event, EventType
+from .utils import AliasTable, as_float
+from .event import Event, EventType, InfectionSchedule
 import re
 
 
+def parse_vicinity(params, groups):
+    # parse --vicinity into {infector_group: {infectee_group: size}}, where
+    # infector_group is "" for infections from the community
+    if not params:
+        return {}
+
+    res = {}
+    for param in params:
+        matched = re.match("^(.*)-(.*)=(\d+)$", param)
+        if matched:
+            infector_sp = matched.group(1)
+            infectee_sp = matched.group(2)
+            neighbor_size = int(matched.group(3))
+        else:
+            matched = re.match("^(.*)=(\d+)$", param)
+            if matched:
+                infector_sp = ""
+                infectee_sp = matched.group(1)
+                neighbor_size = int(matched.group(2))
+            if not matched:
+                raise ValueError(
+                    f'Vicinity should be specified as "INFECTOR_SO-INFECTEE_SP=SIZE": {param} specified'
+                )
+
+        if infector_sp == "":
+            infector_sps = [""]
+        elif infector_sp.startswith("!"):
+            infector_sps = [
+                x
+                for x in groups
+                if not fnmatch(x, infector_sp[1:])
+            ]
+        else:
+            infector_sps = [
+                x for x in groups if fnmatch(x, infector_sp)
+            ]
+
+        if infectee_sp.startswith("!"):
+            infectee_sps = [
+                x
+                for x in groups
+                if not fnmatch(x, infectee_sp[1:])
+            ]
+        else:
+            infectee_sps = [
+                x for x in groups if fnmatch(x, infectee_sp)
+            ]
+
+        if infector_sp != "" and not infector_sps:
+            raise ValueError(f"Unrecognized group {infector_sp}")
+        if not infectee_sps:
+            raise ValueError(f"Unrecognized group {infectee_sp}")
+
+        for infector_sp in infector_sps:
+            for infectee_sp in infectee_sps:
+                if infector_sp in res:
+                    res[infector_sp][infectee_sp] = neighbor_size
+                else:
+                    res[infector_sp] = {infectee_sp: neighbor_size}
+    return res
+
+
+def _array_field(name):
+    # property of Individual that is stored in array name of the population
+    # of the individual, with NaN for False (event has not happened)
+    def get_field(self):
+        if self.population is None:
+            return self.fields[name]
+        value = getattr(self.population, name)[self.row]
+        return False if value != value else float(value)
+
+    def set_field(self, value):
+        if self.population is None:
+            self.fields[name] = value
+        else:
+            self.population.set_field(self.row, name, value)
+
+    return property(get_field, set_field)
+
+
 class Individual(object):
+    # time at which individuals are infected, recovered, show symptom, and
+    # till which individuals are quarantined, which are stored in arrays of
+    # the population after the individuals are added to a population
+    array_fields = ('infected', 'recovered', 'show_symptom', 'quarantined')
+
+    infected = _array_field('infected')
+    recovered = _array_field('recovered')
+    show_symptom = _array_field('show_symptom')
+    quarantined = _array_field('quarantined')
+
     def __init__(self, id, susceptibility, model, logger):
+        # population that stores ID and states of the individual at row,
+        # set when the individual is added to a population
+        self.population = None
+        self.row = None
+        # ID of individuals that are not in a population, which is None
+        # for individuals that are numbered by the population
         self.id = id
         self.model = model
         self.susceptibility = 1.0 if susceptibility is None else min(1, susceptibility)
         self.logger = logger
 
         # these will be set to event happen time
-        self.infected = False
-        self.show_symptom = False
-        self.recovered = False
+        self.fields = {x: False for x in self.array_fields}
         self.symptomatic = None
 
-        self.quarantined = False
-
         self.r0 = None
         self.incubation_period = None
+        self.duration = None
+        self._kernel = None
+        self._peak_idx = None
+
+    @property
+    def id(self):
+        if self.population is None:
+            return self._id
+        return self.population.id(self.row)
+
+    @id.setter
+    def id(self, value):
+        if self.population is not None:
+            raise ValueError("Cannot change ID of an individual in a population.")
+        self._id = value
+        self._group = None if value is None else (value.rsplit("_", 1)[0] if "_" in value else "")
 
     @property
     def group(self):
-        return self.id.rsplit("_", 1)[0] if "_" in self.id else ""
+        if self.population is None:
+            return self._group
+        return self.population.names[self.population.group[self.row]]
+
+    @property
+    def ref(self):
+        # individual in events, which is the row of the individual in its
+        # population, or its ID if it is not in a population
+        return self._id if self.population is None else self.row
+
+    def name_of(self, by):
+        # ID of infector by in log lines
+        return by if self.population is None else self.population.id(by)
 
     def __str__(self):
         return self.id
@@ -38,10 +159,9 @@ class Individual(object):
             till = kwargs["till"]
         else:
             raise ValueError("No till parameter is specified for quarantine event.")
+        # the individual is released by the population at till
         self.quarantined = till
-        return [
-            Event(till, EventType.REINTEGRATION, target=self.id, logger=self.logger)
-        ]
+        return []
 
     def reintegrate(self):
         self.quarantined = False
@@ -59,9 +179,14 @@ class Individual(object):
 
         #
         # infect others
-        (x_grid, trans_prob) = self.model.get_symptomatic_transmission_probability(
-            self.incubation_period, self.r0 * self.r0_multiplier, self.infect_params
-        )
+        if self.model.infection_sampler == "continuous":
+            kernel = self.model.get_continuous_kernel(
+                True, self.incubation_period, self.infect_params)
+            self.duration = kernel.duration
+        else:
+            x_grid = self.set_kernel()
+            trans_prob = self.kernel * (self.r0 * self.r0_multiplier)
+            self.duration = x_grid[-1]
 
         by = kwargs.get("by", None)
 
@@ -71,7 +196,7 @@ class Individual(object):
                     "leadtime is only allowed during initialization of infection event (no by option.)"
                 )
             if kwargs["leadtime"] == "any":
-                lead_time = np.random.uniform(0, x_grid[-1])
+                lead_time = np.random.uniform(0, self.duration)
             elif kwargs["leadtime"] == "asymptomatic":
                 lead_time = np.random.uniform(0, self.incubation_period)
             else:
@@ -100,7 +225,7 @@ class Individual(object):
                 Event(
                     symp_time,
                     EventType.SHOW_SYMPTOM,
-                    target=self.id,
+                    target=self.ref,
                     logger=self.logger,
                 )
             )
@@ -134,7 +259,7 @@ class Individual(object):
                         Event(
                             symp_time,
                             EventType.REMOVAL,
-                            target=self.id,
+                            target=self.ref,
                             logger=self.logger,
                         )
                     )
@@ -166,14 +291,18 @@ class Individual(object):
             if proportion == 1 or np.random.uniform(0, 1, 1)[0] <= proportion:
                 kept = False
                 if symp_time >= 0:
+                    # the quarantine starts when the event is processed,
+                    # which can be rounded by the event queue
+                    event_queue = None if self.population is None else self.population.event_queue
+                    start = symp_time if event_queue is None else event_queue.snap(symp_time)
                     evts.append(
                         # scheduling QUARANTINE
                         Event(
                             symp_time,
                             EventType.QUARANTINE,
-                            target=self.id,
+                            target=self.ref,
                             logger=self.logger,
-                            till=symp_time + quarantine_duration,
+                            till=start + quarantine_duration,
                         )
                     )
                 else:
@@ -184,59 +313,34 @@ class Individual(object):
             )
 
         # infect only before removal or quarantine
-        if kept:
-            x_before = x_grid
+        if self.model.infection_sampler == "continuous":
+            x_infected = kernel.sample(self.r0 * self.r0_multiplier, 0,
+                self.duration if kept else self.incubation_period - lead_time)
         else:
-            # remove or quanratine
-            x_before = [x for x in x_grid if x < self.incubation_period - lead_time]
-        infected = np.random.binomial(1, trans_prob[: len(x_before)], len(x_before))
-        presymptomatic_infected = [
-            xx
-            for xx, ii in zip(x_before, infected)
-            if ii and xx < self.incubation_period
-        ]
-        symptomatic_infected = [
-            xx
-            for xx, ii in zip(x_before, infected)
-            if ii and xx >= self.incubation_period
-        ]
-        if self.quarantined:
-            for idx, x in enumerate(x_before):
-                if time + x < self.quarantined and infected[idx] != 0:
-                    evts.append(
-                        Event(
-                            time + x,
-                            EventType.INFECTION_AVOIDED,
-                            target=self.id,
-                            logger=self.logger,
-                            by=self.id,
-                        )
-                    )
-                    infected[idx] = 0
-        #
-        for x, infe in zip(x_before, infected):
-            if infe:
-                evts.append(
-                    Event(
-                        time + x,
-                        EventType.INFECTION,
-                        target=None,
-                        logger=self.logger,
-                        by=self.id,
-                        handle_symptomatic=kwargs.get("handle_symptomatic", None),
-                    )
-                )
+            if kept:
+                x_before = x_grid
+            else:
+                # remove or quanratine
+                x_before = x_grid[x_grid < self.incubation_period - lead_time]
+            infected = self.model.draw_infections(trans_prob[: len(x_before)])
+            x_infected = np.repeat(x_before, infected)
+        n_presymptomatic = int((x_infected < self.incubation_period).sum())
+        infection_evts = self._schedule_infections(
+            time, x_infected, kwargs.get("handle_symptomatic", None)
+        )
+        n_avoided = sum(x.action == EventType.INFECTION_AVOIDED for x in infection_evts)
+        evts.extend(infection_evts)
 
         evts.append(
             Event(
-                time + x_grid[-1] - lead_time,
+                time + self.duration - lead_time,
                 EventType.RECOVER,
-                target=self.id,
+                target=self.ref,
                 logger=self.logger,
             )
         )
-        if by:
-            params = [f"by={by}"]
+        if by is not None:
+            params = [f"by={self.name_of(by)}"]
         elif lead_time:
             params = [f"leadtime={lead_time:.2f}"]
         else:
@@ -246,9 +350,9 @@ class Individual(object):
             [
                 f"r0={self.r0:.2f}",
                 f"r0_multiplier={self.r0_multiplier:.2f}",
-                f"r={sum(infected)}",
-                f"r_presym={len(presymptomatic_infected)}",
-                f"r_sym={len(symptomatic_infected)}",
+                f"r={len(x_infected) - n_avoided}",
+                f"r_presym={n_presymptomatic}",
+                f"r_sym={len(x_infected) - n_presymptomatic}",
                 f"incu={self.incubation_period:.2f}",
             ]
         )
@@ -267,9 +371,13 @@ class Individual(object):
         by = kwargs.get("by")
         self.infect_params = self.model.draw_infection_params(symptomatic=False)
 
-        (x_grid, trans_prob) = self.model.get_asymptomatic_transmission_probability(
-            self.r0 * self.r0_multiplier, self.infect_params
-        )
+        if self.model.infection_sampler == "continuous":
+            kernel = self.model.get_continuous_kernel(False, None, self.infect_params)
+            self.duration = kernel.duration
+        else:
+            x_grid = self.set_kernel()
+            trans_prob = self.kernel * (self.r0 * self.r0_multiplier)
+            self.duration = x_grid[-1]
 
         if "leadtime" in kwargs and kwargs["leadtime"] is not None:
             if by is not None:
@@ -280,14 +388,14 @@ class Individual(object):
             if kwargs["leadtime"] in ("any", "asymptomatic"):
                 # this is the first infection, the guy should be asymptomatic, but
                 # could be anywhere in his incubation period
-                lead_time = np.random.uniform(0, x_grid[-1])
+                lead_time = np.random.uniform(0, self.duration)
             else:
                 lead_time = min(
                     as_float(
                         kwargs["leadtime"],
                         "--leadtime can only be any, asymptomatic, or a fixed number",
                     ),
-                    x_grid[-1],
+                    self.duration,
                 )
         else:
             lead_time = 0
@@ -297,50 +405,35 @@ class Individual(object):
         # REMOVAL ...
         evts = []
         #
-        if lead_time > 0:
-            idx = int(lead_time / self.model.params.simulation_interval)
-            if idx >= len(trans_prob):
-                idx -= 1
-            trans_prob = trans_prob[idx:]
-            x_grid = x_grid[idx:]
-            x_grid = x_grid - x_grid[0]
-
-        # infect only before removal
-        infected = np.random.binomial(1, trans_prob, len(x_grid))
-        asymptomatic_infected = sum(infected)
-        if self.quarantined:
-            for idx, x in enumerate(x_grid):
-                if time + x < self.quarantined and infected[idx] != 0:
-                    evts.append(
-                        Event(
-                            time + x,
-                            EventType.INFECTION_AVOIDED,
-                            target=self.id,
-                            logger=self.logger,
-                            by=self.id,
-                        )
-                    )
-                    infected[idx] = 0
-        #
-        for x, infe in zip(x_grid, infected):
-            if infe:
-                evts.append(
-                    Event(
-                        time + x,
-                        EventType.INFECTION,
-                        target=None,
-                        logger=self.logger,
-                        by=self.id,
-                        handle_symptomatic=kwargs.get("handle_symptomatic", None),
-                    )
-                )
+        if self.model.infection_sampler == "continuous":
+            x_infected = kernel.sample(self.r0 * self.r0_multiplier, lead_time) - lead_time
+            remaining = self.duration - lead_time
+        else:
+            if lead_time > 0:
+                idx = int(lead_time / self.model.params.simulation_interval)
+                if idx >= len(trans_prob):
+                    idx -= 1
+                trans_prob = trans_prob[idx:]
+                x_grid = x_grid[idx:]
+                x_grid = x_grid - x_grid[0]
+
+            # infect only before removal
+            infected = self.model.draw_infections(trans_prob)
+            x_infected = np.repeat(x_grid, infected)
+            remaining = x_grid[-1]
+        asymptomatic_infected = len(x_infected)
+        evts.extend(
+            self._schedule_infections(
+                time, x_infected, kwargs.get("handle_symptomatic", None)
+            )
+        )
         evts.append(
             Event(
-                time + x_grid[-1], EventType.RECOVER, target=self.id, logger=self.logger
+                time + remaining, EventType.RECOVER, target=self.ref, logger=self.logger
             )
         )
-        if by:
-            params = [f"by={by}"]
+        if by is not None:
+            params = [f"by={self.name_of(by)}"]
         elif lead_time > 0:
             params = [f"leadtime={lead_time:.2f}"]
         else:
@@ -359,6 +452,60 @@ class Individual(object):
         )
         return evts
 
+    def _schedule_infections(self, time, x_infected, handle_symptomatic):
+        # INFECTION events at time + x for each infection at x of sorted
+        # x_infected, or INFECTION_AVOIDED events if they happen during
+        # quarantine. Events created by the same infector share the same
+        # parameters.
+        times = time + x_infected
+        evts = []
+        if self.quarantined:
+            avoided = times < self.quarantined
+            avoided_kwargs = {"by": self.ref}
+            evts = [
+                Event.with_shared_kwargs(
+                    x, EventType.INFECTION_AVOIDED, self.ref, self.logger, avoided_kwargs
+                )
+                for x in times[avoided].tolist()
+            ]
+            times = times[~avoided]
+        #
+        infect_kwargs = {"by": self.ref, "handle_symptomatic": handle_symptomatic}
+        if self.model.lazy_schedule:
+            # queue only the first infection, the rest are kept in a schedule
+            schedule = InfectionSchedule(times.tolist(), self.logger, infect_kwargs)
+            infect_kwargs["schedule"] = schedule
+            evt = schedule.next_event()
+            return evts if evt is None else evts + [evt]
+        evts.extend(
+            Event.with_shared_kwargs(x, EventType.INFECTION, None, self.logger, infect_kwargs)
+            for x in times.tolist()
+        )
+        return evts
+
+    def set_kernel(self):
+        # transmission probabilities of R0=1 at each interval since infection,
+        # which are computed once and shared by all accessors, and the peak
+        # of viral load. The time points are returned.
+        x_grid, self._kernel = self.model.get_transmission_kernel(
+            self.symptomatic, self.incubation_period, self.infect_params)
+        self._peak_idx = np.argmax(self._kernel * self.r0)
+        return x_grid
+
+    @property
+    def kernel(self):
+        # kernels are not needed to draw infections with the continuous
+        # sampler, and are computed only if viral load etc are accessed
+        if self._kernel is None and self.symptomatic is not None:
+            self.set_kernel()
+        return self._kernel
+
+    @property
+    def peak_idx(self):
+        if self._kernel is None and self.symptomatic is not None:
+            self.set_kernel()
+        return self._peak_idx
+
     def transmissibility(self, time):
 
         if self.symptomatic is None:
@@ -366,45 +513,21 @@ class Individual(object):
 
         # return transmissibility at specified time
         interval = time - self.infected
-        if self.symptomatic:
-            (x_grid, trans_prob) = self.model.get_symptomatic_transmission_probability(
-                self.incubation_period, self.r0 * self.r0_multiplier, self.infect_params
-            )
-        else:
-            (x_grid, trans_prob) = self.model.get_asymptomatic_transmission_probability(
-                self.r0 * self.r0_multiplier, self.infect_params
-            )
         idx = int(interval / self.model.params.simulation_interval)
-        return 0 if idx >= len(x_grid) else trans_prob[idx]
+        return 0 if idx >= len(self.kernel) else self.kernel[idx] * (self.r0 * self.r0_multiplier)
 
     def communicable_period(self):
         if self.symptomatic is None:
             raise ValueError('Individual has not been infected yet.')
 
-        if self.symptomatic:
-            (x_grid, trans_prob) = self.model.get_symptomatic_transmission_probability(
-                self.incubation_period, self.r0 * self.r0_multiplier, self.infect_params
-            )
-        else:
-            (x_grid, trans_prob) = self.model.get_asymptomatic_transmission_probability(
-                self.r0 * self.r0_multiplier, self.infect_params
-            )
-        prob = np.array(trans_prob)
+        prob = self.kernel * (self.r0 * self.r0_multiplier)
         return len(np.trim_zeros(prob, 'fb')) * self.model.params.simulation_interval
 
     def total_duration(self):
         if self.symptomatic is None:
             raise ValueError('Individual has not been infected yet.')
 
-        if self.symptomatic:
-            (x_grid, trans_prob) = self.model.get_symptomatic_transmission_probability(
-                self.incubation_period, self.r0 * self.r0_multiplier, self.infect_params
-            )
-        else:
-            (x_grid, trans_prob) = self.model.get_asymptomatic_transmission_probability(
-                self.r0 * self.r0_multiplier, self.infect_params
-            )
-        prob = np.array(trans_prob)
+        prob = self.kernel * (self.r0 * self.r0_multiplier)
         return len(np.trim_zeros(prob, 'b')) * self.model.params.simulation_interval
 
 
@@ -416,15 +539,7 @@ class Individual(object):
 
         # return transmissibility at specified time
         interval = time - self.infected
-        if self.symptomatic:
-            (x_grid, trans_prob) = self.model.get_symptomatic_transmission_probability(
-                self.incubation_period, self.r0, self.infect_params
-            )
-        else:
-            (x_grid, trans_prob) = self.model.get_asymptomatic_transmission_probability(
-                self.r0, self.infect_params
-            )
-        peak_idx = np.argmax(trans_prob)
+        peak_idx = self.peak_idx
         idx = int(interval / self.model.params.simulation_interval)
         multiplier = 0.7 if self.symptomatic else 1.8
         # translate to log10 CP/ML.
@@ -432,14 +547,27 @@ class Individual(object):
         # 0.01 to 3
         # * 10 to up to 8 (10**8)
         if idx < peak_idx:
-            return (multiplier * trans_prob[idx] / self.model.params.simulation_interval) * 20
+            return (multiplier * (self.kernel[idx] * self.r0) / self.model.params.simulation_interval) * 20
         idx = peak_idx + (idx - peak_idx) // 2
-        if idx >= len(x_grid):
+        if idx >= len(self.kernel):
             return 0
         else:
-            return (multiplier * trans_prob[idx] / self.model.params.simulation_interval) * 20
+            return (multiplier * (self.kernel[idx] * self.r0) / self.model.params.simulation_interval) * 20
 
 
+    def clearance_time(self):
+        # time after which the individual has no viral load, None if the
+        # individual has not been infected
+        if self.symptomatic is None:
+            return None
+        # viral load decreases at half the speed after peak, and vanishes
+        # after idx reaches 2 * len(kernel) - peak_idx, with one interval
+        # added for rounding errors
+        if self._kernel is None:
+            # bound with peak_idx = 0 if the kernel has not been computed
+            return self.infected + 2 * self.duration + self.model.params.simulation_interval
+        return self.infected + (2 * len(self.kernel) - self.peak_idx + 1) * self.model.params.simulation_interval
+
     def test_sensitivity(self, time, lod):
         # return transmissibility at specified time
         viral_load = self.viral_load(time)
@@ -453,14 +581,14 @@ class Individual(object):
 
     def infect(self, time, **kwargs):
         if isinstance(self.infected, float):
-            by_id = "." if kwargs["by"] is None else kwargs["by"]
+            by_id = "." if kwargs["by"] is None else self.name_of(kwargs["by"])
             self.logger.write(
                 f"{self.logger.id}\t{time:.2f}\t{EventType.INFECTION_IGNORED.name}\t{self.id}\tby={by_id}\n"
             )
             return []
 
         if self.susceptibility < 1 and rand() > self.susceptibility:
-            by_id = "." if kwargs["by"] is None else kwargs["by"]
+            by_id = "." if kwargs["by"] is None else self.name_of(kwargs["by"])
             self.logger.write(
                 f"{self.logger.id}\t{time:.2f}\t{EventType.INFECTION_FAILED.name}\t{self.id}\tby={by_id},reson=susceptibility\n"
             )
@@ -472,17 +600,127 @@ class Individual(object):
             return self.symptomatic_infect(time, **kwargs)
 
 
+class RowSet(object):
+    '''
+    Rows of individuals kept in an array, from which rows are removed by
+    swapping with the last one so that rows can be added, removed and drawn
+    at random in O(1). Positions of rows are kept in array pos, which can be
+    shared by sets that do not have rows in common.
+    '''
+
+    def __init__(self, pos):
+        self.rows = np.zeros(16, dtype=np.int64)
+        self.size = 0
+        self.pos = pos
+
+    def copy(self, pos):
+        # copy of the set with positions of rows kept in pos
+        res = RowSet(pos)
+        res.rows = self.rows.copy()
+        res.size = self.size
+        return res
+
+    def extend(self, rows):
+        if self.size + len(rows) > len(self.rows):
+            self.rows = np.concatenate([self.rows, np.zeros(self.size + len(rows), dtype=np.int64)])
+        self.rows[self.size:self.size + len(rows)] = rows
+        self.pos[rows] = np.arange(self.size, self.size + len(rows))
+        self.size += len(rows)
+
+    def add(self, row):
+        if self.size == len(self.rows):
+            self.rows = np.concatenate([self.rows, np.zeros(self.size, dtype=np.int64)])
+        self.rows[self.size] = row
+        self.pos[row] = self.size
+        self.size += 1
+
+    def discard(self, row):
+        pos = self.pos[row]
+        if pos < 0:
+            return
+        self.size -= 1
+        last = self.rows[self.size]
+        self.rows[pos] = last
+        self.pos[last] = pos
+        self.pos[row] = -1
+
+    def __contains__(self, row):
+        return self.pos[row] >= 0
+
+    def __getitem__(self, idx):
+        return int(self.rows[idx])
+
+    def __iter__(self):
+        return iter(self.rows[:self.size].tolist())
+
+    def __len__(self):
+        return self.size
+
+
 class Population(object):
-    def __init__(self, popsize, model, vicinity, logger):
-        self.individuals = {}
+    def __init__(self, popsize, model, vicinity, logger, event_queue=None):
+        # states of individuals stored in arrays, with individual at each
+        # row, NaN for events that have not happened, and rows of removed
+        # individuals marked as not present. Individuals are identified by
+        # rows internally, and IDs such as "nurse_12" are translated from
+        # group codes and local indexes of rows only when they are logged.
+        # Individual objects are created only for individuals who are
+        # infected, quarantined, tested etc, and are None in by_row for
+        # individuals in default state.
+        self.model = model
+        self.logger = logger
+        self.size = 0
+        self.by_row = []
+        # rows with Individual objects, which are dropped by compact() after
+        # the individuals recover or if they are in default state, and the
+        # number of rows that were kept by the last compaction
+        self.materialized = []
+        self.n_kept = 0
+        self.present = np.zeros(0, dtype=bool)
+        self.group = np.zeros(0, dtype=np.int32)
+        self.local = np.zeros(0, dtype=np.int64)
+        for name in Individual.array_fields:
+            setattr(self, name, np.zeros(0))
+        # rows of individuals who are added in bulk are found from blocks of
+        # (first local index, first row, number of rows) of each group, and
+        # rows of others from (group code, local index) -> row
+        self.blocks = {}
+        self.lookup = {}
+        # queue of pending events, used to cancel events of individuals
+        # who are removed or quarantined
+        self.event_queue = event_queue
+        # heap of (till, row) of quarantined individuals, who are released
+        # when time advances to till. Entries of individuals who are removed
+        # or quarantined again are skipped.
+        self.releases = []
         self.group_sizes = {
             (ps.split("=", 1)[0] if "=" in ps else ""): 0 for ps in popsize
         }
         self.max_ids = {x: y for x, y in self.group_sizes.items()}
-        self.subpop_from_id = re.compile("^(.*?)[\d]+$")
+        self.names = list(self.group_sizes.keys())
+        self.group_codes = {x: i for i, x in enumerate(self.names)}
+        self.group_susceptibility = self.susceptibility_of_groups(model)
+        # rows of members of each group, in the order they join the group,
+        # including rows of removed individuals until they are compacted
+        self.group_rows = {x: np.zeros(0, dtype=np.int64) for x in self.names}
+        self.n_group_rows = {x: 0 for x in self.names}
+        # individuals who can be infected (not quarantined) in the population
+        # and in each group, with positions of rows in the sets
+        self.eligible_pos = np.zeros(0, dtype=np.int64)
+        self.group_eligible_pos = np.zeros(0, dtype=np.int64)
+        self.eligible = RowSet(self.eligible_pos)
+        self.group_eligible = {x: RowSet(self.group_eligible_pos) for x in self.names}
+        # number of infected (including recovered), recovered and quarantined
+        # members, and number of removed individuals, of each group, updated
+        # when individuals change states
+        self.group_counts = {
+            x: np.zeros(len(self.names), dtype=np.int64)
+            for x in ('infected', 'recovered', 'quarantined', 'removed')
+        }
         self.vicinity = self.parse_vicinity(vicinity)
-
-        idx = 0
+        # alias tables to draw the group of infectees of infectors from each
+        # group, which are cleared when sizes of groups change
+        self.mixing_tables = {}
 
         for ps in popsize:
             if "=" in ps:
@@ -497,131 +735,440 @@ class Population(object):
                 raise ValueError(
                     f"Named population size should be name=int: {ps} provided"
                 )
+            self.allocate(name, sz)
+
+    def susceptibility_of_groups(self, model):
+        # susceptibility of individuals of each group
+        return {
+            x: min(1, getattr(model.params, f"susceptibility_mean", 1)
+                   * getattr(model.params, f"susceptibility_multiplier_{x}", 1))
+            for x in self.names
+        }
 
-            self.add(
-                [
-                    Individual(
-                        f"{name}_{idx}" if name else str(idx),
-                        susceptibility=getattr(model.params, f"susceptibility_mean", 1)
-                        * getattr(model.params, f"susceptibility_multiplier_{name}", 1),
-                        model=model,
-                        logger=logger,
-                    )
-                    for idx in range(idx, idx + sz)
-                ],
-                subpop=name,
-            )
+    def clone(self, model, logger, event_queue=None):
+        '''Return a copy of the population for a new replicate, with its own
+        states of individuals but with parsed group names, vicinity and
+        alias tables shared with this population, which should be a
+        template that is not simulated.'''
+        if any(x is not None for x in self.by_row):
+            raise ValueError('Only populations without Individual objects can be cloned.')
+        pop = copy.copy(self)
+        pop.model = model
+        pop.logger = logger
+        pop.event_queue = event_queue
+        pop.by_row = list(self.by_row)
+        pop.materialized = []
+        for name in ('present', 'group', 'local', 'eligible_pos', 'group_eligible_pos') + Individual.array_fields:
+            setattr(pop, name, getattr(self, name).copy())
+        pop.blocks = {x: list(y) for x, y in self.blocks.items()}
+        pop.lookup = dict(self.lookup)
+        pop.releases = list(self.releases)
+        pop.group_sizes = dict(self.group_sizes)
+        pop.max_ids = dict(self.max_ids)
+        pop.group_susceptibility = self.susceptibility_of_groups(model)
+        pop.group_rows = {x: y.copy() for x, y in self.group_rows.items()}
+        pop.n_group_rows = dict(self.n_group_rows)
+        pop.eligible = self.eligible.copy(pop.eligible_pos)
+        pop.group_eligible = {x: y.copy(pop.group_eligible_pos) for x, y in self.group_eligible.items()}
+        pop.group_counts = {x: y.copy() for x, y in self.group_counts.items()}
+        pop.mixing_tables = dict(self.mixing_tables)
+        return pop
+
+    def parse_id(self, ID):
+        # (group code, local index) of ID, or None if ID is invalid
+        name, idx = ID.rsplit("_", 1) if "_" in ID else ("", ID)
+        if name not in self.group_codes or not idx.isdigit() or str(int(idx)) != idx:
+            return None
+        return (self.group_codes[name], int(idx))
+
+    def row(self, item):
+        # row of individual with ID item, or None if no such individual
+        # has been added. Rows are returned as they are.
+        if not isinstance(item, str):
+            return item
+        key = self.parse_id(item)
+        if key is None:
+            return None
+        code, local = key
+        row = self.lookup.get(key, None)
+        if row is None:
+            for first_local, first_row, n in self.blocks.get(code, []):
+                if first_local <= local < first_local + n:
+                    row = first_row + local - first_local
+                    break
+        # rows of moved individuals are found under their old IDs
+        if row is None or self.group[row] != code or self.local[row] != local:
+            return None
+        return row
+
+    def id(self, item):
+        # ID of the individual at row item, which is formatted from the
+        # group and local index of the row. IDs are returned as they are.
+        if isinstance(item, (int, np.integer)):
+            name = self.names[self.group[item]]
+            return f"{name}_{self.local[item]}" if name else str(self.local[item])
+        return item
+
+    def resolve(self, evts):
+        # translate IDs of targets and infectors of events to rows, which
+        # is needed for events created by plugins with IDs of individuals
+        for evt in evts:
+            if not isinstance(evt, Event):
+                continue
+            if isinstance(evt.target, str):
+                row = self.row(evt.target)
+                if row is not None:
+                    evt.target = row
+            by = evt.kwargs.get("by", None)
+            if isinstance(by, str) and self.row(by) is not None:
+                evt.kwargs["by"] = self.row(by)
+        return evts
 
     def move(self, ID, subpop):
         if subpop not in self.group_sizes:
             raise ValueError(f'Invalid subpopulation name {subpop}')
-        if ID not in self.individuals:
+        if ID not in self:
             return
-        from_sp = self.individuals[ID].group
+        row = self.row(ID)
+        from_sp = self.names[self.group[row]]
         self.group_sizes[from_sp] -= 1
         self.group_sizes[subpop] += 1
-        new_id = f'{subpop}_{self.max_ids[subpop]}'
-        self.individuals[ID].id = new_id
+        self.mixing_tables.clear()
+        # the individual keeps its row and pending events under a new ID
+        self.remove_eligible(row)
+        rows = self.group_rows[from_sp][:self.n_group_rows[from_sp]]
+        self.group_rows[from_sp] = rows[rows != row]
+        self.n_group_rows[from_sp] = len(self.group_rows[from_sp])
+        self.append_rows(subpop, [row])
+        self.count_states(row, -1)
+        self.group[row] = self.group_codes[subpop]
+        self.count_states(row, 1)
+        self.local[row] = self.max_ids[subpop]
+        self.lookup[(self.group_codes[subpop], self.max_ids[subpop])] = row
+        self.update_eligible(row)
         self.max_ids[subpop] += 1
-        return new_id
+        return self.id(row)
 
     def parse_vicinity(self, params):
-        if not params:
-            return {}
-
-        res = {}
-        for param in params:
-            matched = re.match("^(.*)-(.*)=(\d+)$", param)
-            if matched:
-                infector_sp = matched.group(1)
-                infectee_sp = matched.group(2)
-                neighbor_size = int(matched.group(3))
-            else:
-                matched = re.match("^(.*)=(\d+)$", param)
-                if matched:
-                    infector_sp = ""
-                    infectee_sp = matched.group(1)
-                    neighbor_size = int(matched.group(2))
-                if not matched:
-                    raise ValueError(
-                        f'Vicinity should be specified as "INFECTOR_SO-INFECTEE_SP=SIZE": {param} specified'
-                    )
+        return parse_vicinity(params, self.group_sizes.keys())
+
+    def allocate(self, subpop, n, locals=None):
+        # add n individuals in default state to group subpop, numbered after
+        # existing members of the group if their local indexes are not
+        # specified, and return their rows
+        code = self.group_codes[subpop]
+        if self.size + n > len(self.present):
+            self.reserve(2 * (self.size + n))
+        rows = np.arange(self.size, self.size + n)
+        if locals is None:
+            self.blocks.setdefault(code, []).append((self.max_ids[subpop], self.size, n))
+            self.local[rows] = np.arange(self.max_ids[subpop], self.max_ids[subpop] + n)
+        else:
+            self.local[rows] = locals
+            self.lookup.update({(code, x): y for x, y in zip(locals, rows.tolist())})
+        self.size += n
+        self.by_row.extend([None] * n)
+        self.present[rows] = True
+        self.group[rows] = code
+        self.append_rows(subpop, rows)
+        self.eligible.extend(rows)
+        self.group_eligible[subpop].extend(rows)
+        self.group_sizes[subpop] += n
+        self.max_ids[subpop] += n
+        self.mixing_tables.clear()
+        return rows
 
-            if infector_sp == "":
-                infector_sps = [""]
-            elif infector_sp.startswith("!"):
-                infector_sps = [
-                    x
-                    for x in self.group_sizes.keys()
-                    if not fnmatch(x, infector_sp[1:])
-                ]
+    def add(self, items, subpop):
+        # individuals without ID are numbered after existing individuals
+        # of the group
+        keys = [(self.group_codes[subpop], self.max_ids[subpop] + idx) if item.id is None
+                else self.parse_id(item.id) for idx, item in enumerate(items)]
+        if None in keys or any(x[0] != self.group_codes[subpop] for x in keys):
+            raise ValueError(f"One or more IDs do not belong to group {subpop}.")
+        if len(set(keys)) != len(keys) or any(
+                item.id is not None and item.id in self for item in items):
+            raise ValueError(f"One or more IDs are already in the population.")
+        rows = self.allocate(subpop, len(items),
+            None if all(x.id is None for x in items) else [x[1] for x in keys])
+        for item, row in zip(items, rows.tolist()):
+            self.attach(item, row)
+
+    def reserve(self, capacity):
+        # extend arrays to store states of capacity individuals
+        extra = capacity - len(self.present)
+        self.present = np.concatenate([self.present, np.zeros(extra, dtype=bool)])
+        self.group = np.concatenate([self.group, np.zeros(extra, dtype=np.int32)])
+        self.local = np.concatenate([self.local, np.zeros(extra, dtype=np.int64)])
+        for name in Individual.array_fields:
+            setattr(self, name, np.concatenate([getattr(self, name), np.full(extra, np.nan)]))
+        self.eligible_pos = np.concatenate([self.eligible_pos, np.full(extra, -1)])
+        self.group_eligible_pos = np.concatenate([self.group_eligible_pos, np.full(extra, -1)])
+        self.eligible.pos = self.eligible_pos
+        for rows in self.group_eligible.values():
+            rows.pos = self.group_eligible_pos
+
+    def append_rows(self, group, rows):
+        # add rows to members of group
+        n = self.n_group_rows[group]
+        if n + len(rows) > len(self.group_rows[group]):
+            self.group_rows[group] = np.concatenate([self.group_rows[group],
+                np.zeros(n + len(rows), dtype=np.int64)])
+        self.group_rows[group][n:n + len(rows)] = rows
+        self.n_group_rows[group] += len(rows)
+
+    def attach(self, ind, row):
+        # move states of individual to row of arrays
+        for name in Individual.array_fields:
+            value = ind.fields[name]
+            if value is not False and value is not None:
+                self.set_field(row, name, value)
+        ind.fields = None
+        ind.population = self
+        ind.row = row
+        self.by_row[row] = ind
+        self.materialized.append(row)
+
+    def individual(self, row):
+        # individual at row, which is created if the individual has been
+        # in default state
+        ind = self.by_row[row]
+        if ind is None:
+            name = self.names[self.group[row]]
+            ind = Individual(None, susceptibility=self.group_susceptibility[name],
+                model=self.model, logger=self.logger)
+            ind.fields = None
+            ind.population = self
+            ind.row = row
+            self.by_row[row] = ind
+            self.materialized.append(row)
+        return ind
+
+    def compact(self, time, min_size=1024):
+        '''Drop Individual objects of individuals whose states are fully
+        kept in the arrays, namely individuals who have never been infected
+        and have the susceptibility of their groups, and individuals whose
+        viral load has vanished after recovery. These individuals are
+        created again in default state if they are accessed, which does not
+        change the results of tests and infections. Compaction happens only
+        after the number of Individual objects has doubled since the last
+        compaction, so its cost is amortized over the created objects.'''
+        if len(self.materialized) < max(min_size, 2 * self.n_kept):
+            return
+        kept = []
+        for row in self.materialized:
+            ind = self.by_row[row]
+            if ind is None:
+                continue
+            if ind.symptomatic is None:
+                finished = ind.susceptibility == self.group_susceptibility[ind.group]
             else:
-                infector_sps = [
-                    x for x in self.group_sizes.keys() if fnmatch(x, infector_sp)
-                ]
-
-            if infectee_sp.startswith("!"):
-                infectee_sps = [
-                    x
-                    for x in self.group_sizes.keys()
-                    if not fnmatch(x, infectee_sp[1:])
-                ]
+                finished = isinstance(ind.recovered, float) and time >= ind.clearance_time()
+            if finished:
+                self.by_row[row] = None
             else:
-                infectee_sps = [
-                    x for x in self.group_sizes.keys() if fnmatch(x, infectee_sp)
-                ]
-
-            if infector_sp != "" and not infector_sps:
-                raise ValueError(f"Unrecognized group {infector_sp}")
-            if not infectee_sps:
-                raise ValueError(f"Unrecognized group {infectee_sp}")
-
-            for infector_sp in infector_sps:
-                for infectee_sp in infectee_sps:
-                    if infector_sp in res:
-                        res[infector_sp][infectee_sp] = neighbor_size
-                    else:
-                        res[infector_sp] = {infectee_sp: neighbor_size}
-        return res
+                kept.append(row)
+        self.materialized = kept
+        self.n_kept = len(kept)
+
+    def is_quarantined(self, row):
+        # quarantined is NaN if the individual has not been quarantined
+        return not np.isnan(self.quarantined[row]) and self.quarantined[row] != 0
+
+    def susceptibility(self, row):
+        ind = self.by_row[row]
+        if ind is None:
+            return self.group_susceptibility[self.names[self.group[row]]]
+        return ind.susceptibility
+
+    def detach(self, ind):
+        # move ID and states of individual out of the arrays
+        ind.fields = {x: getattr(ind, x) for x in Individual.array_fields}
+        ID = ind.id
+        self.present[ind.row] = False
+        self.by_row[ind.row] = None
+        self.count_states(ind.row, -1)
+        self.group_counts['removed'][self.group[ind.row]] += 1
+        self.remove_eligible(ind.row)
+        ind.population = None
+        ind.row = None
+        ind.id = ID
+
+    def set_field(self, row, name, value):
+        # set state name of individual at row, and update counters and
+        # eligible individuals
+        values = getattr(self, name)
+        was_set = not np.isnan(values[row])
+        values[row] = np.nan if value is False or value is None else value
+        is_set = not np.isnan(values[row])
+        if name in self.group_counts:
+            self.group_counts[name][self.group[row]] += is_set - was_set
+        if name == 'quarantined':
+            if is_set:
+                heapq.heappush(self.releases, (float(values[row]), row))
+            self.update_eligible(row)
+
+    def next_release(self):
+        # time of the next release from quarantine, None if no one is
+        # quarantined
+        while self.releases:
+            till, row = self.releases[0]
+            if self.present[row] and self.quarantined[row] == till:
+                return till
+            heapq.heappop(self.releases)
+        return None
+
+    def pending_releases(self):
+        return sum(bool(self.present[row]) and self.quarantined[row] == till
+                   for till, row in self.releases)
+
+    def release(self, time, snap=None):
+        # release individuals whose quarantine ends at or before time, with
+        # end of quarantine rounded by snap
+        while True:
+            till = self.next_release()
+            if till is None or (till if snap is None else snap(till)) > time:
+                break
+            ind = self.individual(heapq.heappop(self.releases)[1])
+            ind.reintegrate()
+            ind.logger.write(
+                f'{ind.logger.id}\t{time:.2f}\t{EventType.REINTEGRATION.name}\t{ind.id}\tsucc=True\n'
+            )
 
-    def add(self, items, subpop):
-        sz = len(self.individuals)
-        self.individuals.update({x.id: x for x in items})
-        if sz + len(items) != len(self.individuals):
-            raise ValueError(f"One or more IDs are already in the population.")
-        self.group_sizes[subpop] += len(items)
-        self.max_ids[subpop] += len(items)
+    def count_states(self, row, sign):
+        # add (sign=1) or remove (sign=-1) states of individual at row to or
+        # from the counters of its group
+        for name in ('infected', 'recovered', 'quarantined'):
+            if not np.isnan(getattr(self, name)[row]):
+                self.group_counts[name][self.group[row]] += sign
+
+    def members(self, group=None):
+        # rows of individuals in the population, or of members of group in
+        # the order they join the group, in O(size of group)
+        if group is None:
+            return np.flatnonzero(self.present[:self.size])
+        rows = self.group_rows[group][:self.n_group_rows[group]]
+        rows = rows[self.present[rows]]
+        if len(rows) < self.n_group_rows[group] // 2:
+            # compact rows of removed individuals
+            self.group_rows[group] = rows.copy()
+            self.n_group_rows[group] = len(rows)
+        return rows
+
+    def ids_of(self, rows):
+        return [self.id(x) for x in rows]
+
+    def update_eligible(self, row):
+        # add or remove individual from the arrays of eligible individuals
+        # according to its quarantine status
+        if self.is_quarantined(row):
+            self.remove_eligible(row)
+        elif row not in self.eligible:
+            self.eligible.add(row)
+            self.group_eligible[self.names[self.group[row]]].add(row)
+
+    def remove_eligible(self, row):
+        if row in self.eligible:
+            self.eligible.discard(row)
+            self.group_eligible[self.names[self.group[row]]].discard(row)
 
     @property
     def ids(self):
-        return self.individuals.keys()
+        return self.ids_of(self.members())
+
+    @property
+    def individuals(self):
+        # individuals in the population by ID
+        return dict(self.items())
 
     def remove(self, item):
-        self.group_sizes[self.individuals[item].group] -= 1
-        self.individuals.pop(item)
+        row = self.row(item)
+        ind = self[item]
+        self.group_sizes[ind.group] -= 1
+        self.mixing_tables.clear()
+        self.detach(ind)
+        self.cancel_events(row)
+
+    def count(self, name, group=None):
+        # number of susceptible, infected (including recovered), active,
+        # recovered, quarantined and removed individuals, and popsize, of
+        # the population or of group, in O(1)
+        code = slice(None) if group is None else self.group_codes[group]
+        if name == 'popsize':
+            return len(self) if group is None else self.group_sizes[group]
+        elif name == 'susceptible':
+            return self.count('popsize', group) - self.count('infected', group)
+        elif name == 'active':
+            return self.count('infected', group) - self.count('recovered', group)
+        elif name in self.group_counts:
+            return int(self.group_counts[name][code].sum())
+        raise ValueError(f'Unrecognized counter {name}')
+
+    @property
+    def n_infected(self):
+        return self.count('infected')
+
+    @property
+    def n_recovered(self):
+        return self.count('recovered')
+
+    def counter(self, name):
+        # value of a counter used by stop conditions
+        if name == 'popsize':
+            return len(self)
+        elif name.startswith('n_'):
+            return self.count(name[2:])
+        raise ValueError(f'Unrecognized counter {name}')
+
+    def cancel_events(self, item):
+        # cancel pending events of individual
+        if self.event_queue is None:
+            return []
+        return self.event_queue.cancel(self.row(item))
 
     def __len__(self):
-        return len(self.individuals)
+        return sum(self.group_sizes.values())
 
     def __contains__(self, item):
-        return item in self.individuals
+        row = self.row(item)
+        return row is not None and 0 <= row < self.size and bool(self.present[row])
 
-    def __getitem__(self, id):
-        return self.individuals[id]
+    def __getitem__(self, item):
+        if item not in self:
+            raise KeyError(item)
+        return self.individual(self.row(item))
 
     def items(self):
-        return self.individuals.items()
+        return ((self.id(x), self.individual(x)) for x in self.members())
 
     def values(self):
-        return self.individuals.values()
+        return (self.individual(x) for x in self.members())
+
+    def mixing_table(self, group):
+        # groups and an alias table to draw the group of infectees of an
+        # infector from group, None if no one can be infected
+        if group not in self.mixing_tables:
+            # quota from each group.
+            freq = dict(self.vicinity[group])
+            for grp in self.group_sizes.keys():
+                if grp not in freq:
+                    freq[grp] = self.group_sizes[grp]
+                    # now, we know the number of qualified invidiauls from each
+                    # group, but we still have excluded and quarantined....
+            groups = list(self.group_sizes.keys())
+            weights = [freq[x] for x in groups]
+            self.mixing_tables[group] = (groups,
+                AliasTable(weights) if sum(weights) > 0 else None)
+        return self.mixing_tables[group]
 
     def select(self, infector=None):
-        # select one non-quarantined indivudal to infect
+        # select row of one non-quarantined indivudal to infect
         #
-        if infector is not None and infector not in self.individuals:
+        if infector is not None and infector not in self:
             raise RuntimeError(
-                f"Can not select infectee if since infector {infector} no longer exists."
+                f"Can not select infectee if since infector {self.id(infector)} no longer exists."
             )
+        row = None if infector is None else self.row(infector)
+        group = None if row is None else self.names[self.group[row]]
 
         # if not cicinity is defines, or
         # if infection is from community and '' not in vicinity, or
@@ -631,40 +1178,31 @@ class Population(object):
             or (infector is None and "" not in self.vicinity)
             or (
                 infector is not None
-                and self.individuals[infector].group not in self.vicinity
+                and group not in self.vicinity
             )
         ):
-            ids = [
-                id
-                for id, ind in self.individuals.items()
-                if infector != ind.id and not ind.quarantined
-            ]
+            items = self.eligible
         else:
-            # quota from each group.
-            groups = list(self.group_sizes.keys())
-
-            if infector in self.individuals:
-                freq = copy.deepcopy(self.vicinity[self.individuals[infector].group])
-            else:
-                freq = copy.deepcopy(self.vicinity[""])
-
-            for grp in self.group_sizes.keys():
-                if grp not in freq:
-                    freq[grp] = self.group_sizes[grp]
-                    # now, we know the number of qualified invidiauls from each
-                    # group, but we still have excluded and quarantined....
-            total = sum(freq.values())
-            freq = {x: y / total for x, y in freq.items()}
             # first determine which group ...
-            grp = choice(groups, 1, p=[freq[x] for x in groups])
+            groups, table = self.mixing_table(
+                "" if infector is None else group)
+            if table is None:
+                return None
+            grp = groups[table.sample()]
 
             # then select a random individual from the group.
-            ids = [
-                id
-                for id, ind in self.individuals.items()
-                if ind.group == grp and infector != ind.id and not ind.quarantined
-            ]
-
-        if not ids:
+            items = self.group_eligible[grp]
+
+        # select a random eligible individual other than the infector, which
+        # is skipped by drawing from the other n - 1 individuals
+        n = len(items)
+        pos = None if row is None else items.pos[row]
+        if pos is not None and 0 <= pos < n and items[pos] == row:
+            n -= 1
+            if n == 0:
+                return None
+            idx = np.random.randint(n)
+            return items[n if idx == pos else idx]
+        if n == 0:
             return None
-        return choice(ids)
+        return items[np.random.randint(n)]
@@ -0,0 +1,306 @@
+import heapq
+from collections import defaultdict
+from itertools import count
+
+from .event import Event, EventType
+
+
+class IndexedEventQueue(object):
+    '''
+    Base class of event queues that keep an index from individual ID to its
+    pending events. Events of an individual can then be cancelled when the
+    individual is removed or quarantined. Cancelled events are marked as
+    tombstones and are skipped when they are popped from the queue.
+
+    Each queued event is stored as an entry [time, seq, evt], where seq is
+    the order in which the event is pushed, and evt is set to None when the
+    event is cancelled.
+    '''
+
+    def __init__(self):
+        self._counter = count()
+        self._size = 0
+        # ID -> {seq: entry}
+        self._pending = defaultdict(dict)
+        # number of pending events for each type of events, and number of
+        # pending infections for each infector
+        self._counts = defaultdict(int)
+        self._infectors = defaultdict(int)
+
+    @staticmethod
+    def _keys(evt):
+        if not isinstance(evt, Event):
+            return ()
+        by = evt.kwargs.get('by', None)
+        if by is None or by == evt.target:
+            return () if evt.target is None else (evt.target,)
+        return (by,) if evt.target is None else (by, evt.target)
+
+    def _count(self, evt, delta):
+        if evt.action == EventType.INFECTION:
+            by = evt.kwargs.get('by', None)
+            if by is None:
+                return
+            self._infectors[by] += delta
+            if not self._infectors[by]:
+                self._infectors.pop(by)
+        self._counts[evt.action.name] += delta
+
+    def _new_entry(self, evt):
+        entry = [evt.time, next(self._counter), evt]
+        for key in self._keys(evt):
+            self._pending[key][entry[1]] = entry
+        self._count(evt, 1)
+        self._size += 1
+        return entry
+
+    def _release_entry(self, entry):
+        # called when an entry is popped from the queue
+        evt = entry[2]
+        if evt is None:
+            return None
+        for key in self._keys(evt):
+            entries = self._pending.get(key, None)
+            if entries is not None:
+                entries.pop(entry[1], None)
+                if not entries:
+                    self._pending.pop(key)
+        self._count(evt, -1)
+        self._size -= 1
+        return evt
+
+    def cancel(self, ID):
+        '''Cancel pending events of individual ID. Cancelled events are
+        returned.'''
+        entries = self._pending.get(ID, None)
+        if not entries:
+            return []
+        cancelled = list(entries.values())
+        res = []
+        for entry in cancelled:
+            res.append(self._release_entry(entry))
+            entry[2] = None
+        return res
+
+    def remove(self, cond):
+        '''Cancel pending events for which cond(evt) is True.'''
+        for entry in self._entries():
+            if entry[2] is not None and cond(entry[2]):
+                self._release_entry(entry)
+                entry[2] = None
+
+    def __getstate__(self):
+        # itertools.count cannot be pickled by newer versions of Python
+        state = self.__dict__.copy()
+        state['_counter'] = next(self._counter)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._counter = count(state['_counter'])
+
+    def summarize(self, population):
+        '''Return number of pending events of each type, and the number of
+        infectors with pending infections. Infections kept in the schedules
+        of lazily scheduled infectors are counted as pending infections.'''
+        counts = {x: y for x, y in self._counts.items() if y}
+        for by in self._infectors:
+            for entry in self._pending[by].values():
+                schedule = entry[2].kwargs.get('schedule', None)
+                if schedule is not None and entry[2].action == EventType.INFECTION:
+                    counts['INFECTION'] += len(schedule)
+        return counts, len(self._infectors)
+
+    def extend(self, evts):
+        for evt in evts:
+            self.push(evt)
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+
+class HeapEventQueue(IndexedEventQueue):
+    '''
+    Pending events of a simulation, kept in a binary heap ordered by time.
+    Events scheduled at the same time are returned in the order in which
+    they are pushed.
+    '''
+
+    def __init__(self):
+        super(HeapEventQueue, self).__init__()
+        self._heap = []
+
+    def push(self, evt):
+        heapq.heappush(self._heap, self._new_entry(evt))
+
+    def snap(self, time):
+        # time at which an event scheduled at specified time will be processed
+        return time
+
+    def next_time(self):
+        # time of the next event, 0 if there is no pending event
+        while self._heap and self._heap[0][2] is None:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else 0.00
+
+    def pop(self, time):
+        # all events at specified time, in the order they were pushed
+        res = []
+        while self._heap and self._heap[0][0] == time:
+            evt = self._release_entry(heapq.heappop(self._heap))
+            if evt is not None:
+                res.append(evt)
+        return res
+
+    def _entries(self):
+        return self._heap
+
+    def __iter__(self):
+        return (x[2] for x in self._heap if x[2] is not None)
+
+
+class DictEventQueue(object):
+    '''
+    Events grouped by time in a dictionary, with the next time found by a
+    scan of all pending time points. This is the original implementation
+    of the simulator and is kept for comparison. It does not cancel events
+    of removed or quarantined individuals.
+    '''
+
+    def __init__(self):
+        self._events = defaultdict(list)
+
+    def push(self, evt):
+        self._events[evt.time].append(evt)
+
+    def extend(self, evts):
+        for evt in evts:
+            self.push(evt)
+
+    def snap(self, time):
+        return time
+
+    def next_time(self):
+        return min(self._events.keys()) if self._events else 0.00
+
+    def pop(self, time):
+        return self._events.pop(time, [])
+
+    def remove(self, cond):
+        for time in list(self._events.keys()):
+            self._events[time] = [x for x in self._events[time] if not cond(x)]
+            if not self._events[time]:
+                self._events.pop(time)
+
+    def cancel(self, ID):
+        return []
+
+    def summarize(self, population):
+        remaining_events = defaultdict(int)
+        infected_by = set()
+        for event in self:
+            if event.action.name in ('SHOW_SYMPTOM', 'RECOVER', 'REMOVAL') and event.target not in population:
+                continue
+            if event.action.name in ('INFECTION'):
+                if event.kwargs['by'] in population:
+                    infected_by.add(event.kwargs['by'])
+                else:
+                    continue
+                if 'schedule' in event.kwargs:
+                    remaining_events[event.action.name] += len(event.kwargs['schedule'])
+            remaining_events[event.action.name] += 1
+        return remaining_events, len(infected_by)
+
+    def __len__(self):
+        return sum(len(x) for x in self._events.values())
+
+    def __bool__(self):
+        return bool(self._events)
+
+    def __iter__(self):
+        return (evt for evts in self._events.values() for evt in evts)
+
+
+class CalendarEventQueue(IndexedEventQueue):
+    '''
+    Events grouped into buckets of integer ticks of the simulation interval.
+    Event times are quantized to the nearest tick so that events that are
+    numerically close (e.g. time + x on the grid of transmission
+    probabilities) are processed in the same step. Buckets are kept in a
+    dictionary and a cursor moves forward from one tick to the next, so
+    both insertion and lookup of the next bucket are O(1) amortized.
+    '''
+
+    def __init__(self, interval):
+        super(CalendarEventQueue, self).__init__()
+        self.interval = float(interval)
+        self._buckets = {}
+        self._cursor = None
+
+    def tick(self, time):
+        return int(round(time / self.interval))
+
+    def snap(self, time):
+        return self.tick(time) * self.interval
+
+    def push(self, evt):
+        tick = self.tick(evt.time)
+        evt.time = tick * self.interval
+        entry = self._new_entry(evt)
+        if tick in self._buckets:
+            self._buckets[tick].append(entry)
+        else:
+            self._buckets[tick] = [entry]
+        if self._cursor is None or tick < self._cursor:
+            self._cursor = tick
+
+    def next_time(self):
+        if not self._size:
+            return 0.00
+        # move the cursor to the next non-empty bucket, and jump directly
+        # to the smallest tick if the buckets are too sparse to be scanned
+        scanned = 0
+        while True:
+            bucket = self._buckets.get(self._cursor, None)
+            if bucket is not None:
+                if any(x[2] is not None for x in bucket):
+                    break
+                # a bucket with only cancelled events
+                self._buckets.pop(self._cursor)
+            self._cursor += 1
+            scanned += 1
+            if scanned > len(self._buckets):
+                self._cursor = min(self._buckets.keys())
+                scanned = 0
+        return self._cursor * self.interval
+
+    def pop(self, time):
+        res = []
+        for entry in self._buckets.pop(self.tick(time), []):
+            evt = self._release_entry(entry)
+            if evt is not None:
+                res.append(evt)
+        return res
+
+    def _entries(self):
+        return (x for entries in self._buckets.values() for x in entries)
+
+    def __iter__(self):
+        return (x[2]
+                for entries in self._buckets.values()
+                for x in entries
+                if x[2] is not None)
+
+
+def create_event_queue(name, interval=None):
+    if name == 'heap':
+        return HeapEventQueue()
+    elif name == 'calendar':
+        return CalendarEventQueue(interval)
+    elif name == 'legacy':
+        return DictEventQueue()
+    else:
+        raise ValueError(f'Unrecognized event queue {name}')
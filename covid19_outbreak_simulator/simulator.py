@@ -1,13 +1,23 @@
 from datetime import datetime
+import math
+import operator
+import os
+import pickle
+import random
+import re
 import subprocess
 
-from collections import defaultdict
+import numpy as np
+
+from collections import defaultdict, deque
 from importlib import import_module
 from itertools import groupby
 
 from .event import Event, EventType
+from .plugin import PlugInEvent
 from .model import Model
 from .population import Population
+from .scheduler import create_event_queue
 
 
 def load_plugins(args, simulator=None):
@@ -48,6 +58,75 @@ def load_plugins(args, simulator=None):
     return plugins
 
 
+class StopCondition(object):
+    '''
+    A condition such as n_infected>200 at which a simulation stops. It
+    compares the time (t), or a counter of the population (n_infected,
+    n_recovered, n_active or popsize), with a number.
+    '''
+    operators = {
+        '>=': operator.ge,
+        '<=': operator.le,
+        '==': operator.eq,
+        '!=': operator.ne,
+        '>': operator.gt,
+        '<': operator.lt,
+    }
+    counters = ('t', 'n_infected', 'n_recovered', 'n_active', 'popsize')
+
+    def __init__(self, condition):
+        matched = re.match(r'^\s*(\w+)\s*(>=|<=|==|!=|>|<)\s*([^\s]+)\s*$', condition)
+        if not matched:
+            raise ValueError(f'Invalid stop condition "{condition}": it should be in the format of NAME>VALUE')
+        self.name, op, value = matched.groups()
+        if self.name not in self.counters:
+            raise ValueError(
+                f'Invalid stop condition "{condition}": only {", ".join(self.counters)} are supported')
+        if self.name == 't' and op not in ('>', '>='):
+            raise ValueError(
+                f'Invalid stop condition "{condition}": only t>TIME or t>=TIME is allowed for time')
+        try:
+            self.value = float(value)
+        except ValueError:
+            raise ValueError(f'Invalid value for stop condition "{condition}": {value}')
+        self.op = self.operators[op]
+        self.condition = f'{self.name}{op}{value}'
+
+    def __call__(self, value):
+        return self.op(value, self.value)
+
+    def __str__(self):
+        return self.condition
+
+
+def parse_stop_if(stop_if):
+    # return conditions on time and on counters of the population
+    conditions = [StopCondition(x) for x in (stop_if or [])]
+    return [x for x in conditions if x.name == 't'], [x for x in conditions if x.name != 't']
+
+
+def format_remaining_events(remaining_events, n_infectors):
+    # remaining_events of END line, from the number of pending events of
+    # each type and the number of infectors with pending infections
+    if n_infectors:
+        remaining_events['INFECTION'] = f"{remaining_events['INFECTION']} (by {n_infectors} infectors)"
+    return ','.join(f'{x}:{y}' for x,y in sorted(remaining_events.items()))
+
+
+# populations in initial state, by population sizes and vicinity, which
+# are built once by each process and cloned for each replicate
+population_templates = {}
+
+
+def create_population(simu_args, model, logger, event_queue):
+    key = (tuple(simu_args.popsize), tuple(simu_args.vicinity or ()))
+    if key not in population_templates:
+        population_templates[key] = Population(popsize=simu_args.popsize,
+            model=model, vicinity=simu_args.vicinity, logger=logger)
+    return population_templates[key].clone(model=model, logger=logger,
+        event_queue=event_queue)
+
+
 class Simulator(object):
 
     def __init__(self, params, logger, simu_args, cmd):
@@ -75,17 +154,28 @@ class Simulator(object):
         return initial_events, trigger_events_dict
 
     def simulate(self, id):
+        if self.simu_args.resume and self.simu_args.checkpoint_dir and os.path.isfile(
+                os.path.join(self.simu_args.checkpoint_dir, f'{id}.pickle')):
+            return self.resume(id)
+        if self.simu_args.fork_from:
+            return self.fork(id)
         #
         # get proportion of asymptomatic
         #
-        self.model = Model(self.params)
+        self.model = Model(self.params,
+            lazy_schedule=self.simu_args.lazy_schedule,
+            kernel_tolerance=self.simu_args.kernel_tolerance,
+            verify_kernels=self.simu_args.verify_kernels,
+            infection_sampler=self.simu_args.infection_sampler)
         self.model.draw_prop_asym_carriers()
 
+        events = create_event_queue(self.simu_args.event_queue,
+            interval=self.params.simulation_interval)
+
         # collection of individuals
-        population = Population(popsize=self.simu_args.popsize, model=self.model,
-            vicinity=self.simu_args.vicinity, logger=self.logger)
+        population = create_population(self.simu_args, model=self.model,
+            logger=self.logger, event_queue=events)
 
-        events = defaultdict(list)
         self.logger.id = id
 
         infectors = [] if self.simu_args.infectors is None else self.simu_args.infectors
@@ -93,11 +183,11 @@ class Simulator(object):
             if infector not in population:
                 raise ValueError(f'Invalid ID for carrier {infector}')
             # infect the first person
-            events[0].append(
+            events.push(
                 Event(
                     0,
                     EventType.INFECTION,
-                    target=infector,
+                    target=population.row(infector),
                     logger=self.logger,
                     by=None,
                     handle_symptomatic=self.simu_args.handle_symptomatic,
@@ -105,8 +195,7 @@ class Simulator(object):
 
         # load the plugins
         init_events, trigger_events = self.get_plugin_events()
-        for evt in init_events:
-            events[evt.time].append(evt)
+        events.extend(init_events)
 
         start_params = {
             'id': self.logger.id,
@@ -118,29 +207,136 @@ class Simulator(object):
         self.logger.write(
             f'{self.logger.id}\t0.00\t{EventType.START.name}\t.\t{start_params}\n'
         )
+        self.run(population, events, trigger_events)
+
+    def fork(self, id):
+        '''Continue replicate id from its snapshot in --fork-from, with
+        plugins of this simulation.'''
+        snapshot = self.restore(id, os.path.join(self.simu_args.fork_from, f'{id}.pickle'))
+        if snapshot['finished']:
+            # the replicate ended before the time of the snapshot
+            return
+
+        events = snapshot['events']
+        trigger_events = snapshot['trigger_events']
+        if self.simu_args.plugin != snapshot['plugin']:
+            # replace pending plugin calls with calls of plugins of this simulation
+            events.remove(lambda x: isinstance(x, PlugInEvent))
+            init_events, trigger_events = self.get_plugin_events()
+            for evt in init_events:
+                if evt.time < snapshot['time'] and evt.args.interval:
+                    evt.time += math.ceil((snapshot['time'] - evt.time) / evt.args.interval) * evt.args.interval
+                    if evt.args.end is not None and evt.time > evt.args.end:
+                        continue
+                if evt.time >= snapshot['time']:
+                    events.push(evt)
+        self.run(snapshot['population'], events, trigger_events,
+            start=snapshot['time'], forked_at=snapshot['time'])
+
+    def resume(self, id):
+        '''Continue replicate id from its checkpoint in --checkpoint-dir.'''
+        checkpoint = self.restore(id, os.path.join(self.simu_args.checkpoint_dir, f'{id}.pickle'))
+        self.run(checkpoint['population'], checkpoint['events'], checkpoint['trigger_events'],
+            start=checkpoint['time'], forked_at=checkpoint['forked_at'])
+
+    def restore(self, id, filename):
+        # restore the model, log and random number generators from a
+        # snapshot or checkpoint, and return the saved state
+        self.logger.id = id
+        state = self.load_state(filename)
+        for line in state['log'].splitlines(keepends=True):
+            self.logger.write(line)
+        self.model = state['model']
+        random.setstate(state['random_state'])
+        np.random.set_state(state['np_random_state'])
+        return state
+
+    def save_state(self, filename, time, population, events, trigger_events,
+            finished=False, forked_at=None):
+        '''Save the state of the simulation before events at time, so that
+        the simulation can be continued or forked from it. The file is
+        written atomically so that an interrupted write does not corrupt an
+        existing file.'''
+        state = {
+            'time': time,
+            'finished': finished,
+            'forked_at': forked_at,
+            'log': self.logger.getvalue(),
+            'plugin': self.simu_args.plugin,
+            'model': self.model,
+            'population': population,
+            'events': events,
+            'trigger_events': trigger_events,
+            'random_state': random.getstate(),
+            'np_random_state': np.random.get_state(),
+        }
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        with open(filename + '.tmp', 'wb') as ss:
+            pickler = pickle.Pickler(ss, protocol=pickle.HIGHEST_PROTOCOL)
+            # the logger and the simulator (referred to by plugins) are replaced
+            # by those of the simulation that loads the state
+            pickler.persistent_id = lambda obj: 'logger' if obj is self.logger else (
+                'simulator' if obj is self else None)
+            pickler.dump(state)
+        os.replace(filename + '.tmp', filename)
+
+    def load_state(self, filename):
+        if not os.path.isfile(filename):
+            raise ValueError(f'Snapshot or checkpoint {filename} does not exist.')
+        with open(filename, 'rb') as ss:
+            unpickler = pickle.Unpickler(ss)
+            unpickler.persistent_load = lambda pid: self.logger if pid == 'logger' else self
+            return unpickler.load()
+
+    def run(self, population, events, trigger_events, start=0, forked_at=None):
+        time_conditions, stop_conditions = parse_stop_if(self.simu_args.stop_if)
+        snapshot_at = self.simu_args.snapshot_at
+        if forked_at is not None or (snapshot_at is not None and start >= snapshot_at):
+            snapshot_at = None
+        snapshot_file = None if snapshot_at is None else os.path.join(
+            self.simu_args.snapshot_dir, f'{self.logger.id}.pickle')
+        checkpoint_file = None if not self.simu_args.checkpoint_dir else os.path.join(
+            self.simu_args.checkpoint_dir, f'{self.logger.id}.pickle')
+        next_checkpoint = start + self.simu_args.checkpoint_interval
+        last_checkpoint = datetime.now()
+        stopped_by = None
         while True:
-            # find the latest event
-            time = 0.00 if not events else min(events.keys())
+            # find the latest event, or the next release from quarantine
+            time = events.next_time()
+            release = population.next_release()
+            if release is not None and (not events or events.snap(release) < time):
+                time = events.snap(release)
 
-            if self.simu_args.stop_if is not None:
-                st = float(self.simu_args.stop_if[0][2:])
-                if time > st:
-                    time = st
-                    break
+            if snapshot_at is not None and time >= snapshot_at:
+                self.save_state(snapshot_file, snapshot_at, population, events, trigger_events)
+                snapshot_at = None
+
+            if checkpoint_file is not None and (time >= next_checkpoint or (
+                    self.simu_args.checkpoint_minutes is not None and
+                    (datetime.now() - last_checkpoint).total_seconds() >= 60 * self.simu_args.checkpoint_minutes)):
+                self.save_state(checkpoint_file, time, population, events, trigger_events,
+                    forked_at=forked_at)
+                next_checkpoint = time + self.simu_args.checkpoint_interval
+                last_checkpoint = datetime.now()
+
+            stopped_by = next((x for x in time_conditions if x(time)), None)
+            if stopped_by is not None:
+                time = stopped_by.value
+                break
+
+            population.release(time, events.snap)
 
             new_events = []
             aborted = False
-            # processing events
-            cur_events = [x for x in events[time] if x.priority
-                         ] + [x for x in events[time] if not x.priority]
-            while True:
-                try:
-                    evt = cur_events.pop(0)
-                except:
-                    break
+            # processing events, with priority events before others
+            evts = events.pop(time)
+            cur_events = deque(x for x in evts if x.priority)
+            cur_events.extend(x for x in evts if not x.priority)
+            while cur_events:
+                evt = cur_events.popleft()
                 if evt.action == EventType.ABORT:
                     self.logger.write(
-                        f'{self.logger.id}\t{time:.2f}\t{EventType.ABORT.name}\t{evt.target}\tpopsize={len(population)}\n'
+                        f'{self.logger.id}\t{time:.2f}\t{EventType.ABORT.name}\t{population.id(evt.target)}\tpopsize={len(population)}\n'
                     )
                     aborted = True
                     break
@@ -151,45 +347,43 @@ class Simulator(object):
                         res.append(x)
 
                 for x in res:
-                    if x.time == time:
+                    if events.snap(x.time) == time:
                         if x.priority:
-                            cur_events.insert(0, x)
+                            cur_events.appendleft(x)
                         else:
                             cur_events.append(x)
                     else:
                         new_events.append(x)
 
-            events.pop(time)
+            # drop objects of recovered and untouched individuals
+            population.compact(time)
+
             # if there is no other events, and all new ones are plugin generated
             # (through --interval, it is time to stop
-            all_plugin = not events
+            all_plugin = not events and population.next_release() is None
             for evt in new_events:
                 # print(f'ADDING\t{evt}')
-                events[evt.time].append(evt)
+                events.push(evt)
                 if isinstance(evt, Event):
                     all_plugin = False
 
-            if not events or aborted or (all_plugin and
-                                         self.simu_args.stop_if is None):
+            # counters of the population are checked after each time point
+            stopped_by = next((x for x in stop_conditions
+                if x(population.counter(x.name))), None)
+            if stopped_by is not None:
+                break
+
+            if (not events and population.next_release() is None) or aborted or (
+                    all_plugin and not time_conditions):
                 break
             # if self.simu_args.handle_symptomatic and all(
             #         x.infected for x in population.values()):
             #     break
-        remaining_events = defaultdict(int)
-        infected_by = set()
-        for time, events_at_time in events.items():
-            for event in events_at_time:
-                if event.action.name in ('SHOW_SYMPTOM', 'RECOVER', 'REMOVAL') and event.target not in population:
-                    continue
-                if event.action.name in ('INFECTION'):
-                    if event.kwargs['by'] in population:
-                        infected_by.add(event.kwargs['by'])
-                    else:
-                        continue
-                remaining_events[event.action.name] += 1
-        if infected_by:
-            remaining_events['INFECTION'] = f"{remaining_events['INFECTION']} (by {len(infected_by)} infectors)"
-        remaining_events = ','.join(f'{x}:{y}' for x,y in remaining_events.items())
+        remaining_events, n_infectors = events.summarize(population)
+        n_releases = population.pending_releases()
+        if n_releases:
+            remaining_events['REINTEGRATION'] = remaining_events.get('REINTEGRATION', 0) + n_releases
+        remaining_events = format_remaining_events(remaining_events, n_infectors)
         res = {
             'popsize': len(population),
             'prop_asym': f'{self.model.params.prop_asym_carriers:.3f}',
@@ -198,9 +392,19 @@ class Simulator(object):
         if remaining_events:
             res['remaining_events'] = remaining_events
         if self.simu_args.stop_if:
-            res['stop_if'] = ''.join(self.simu_args.stop_if)
+            res['stop_if'] = ';'.join(self.simu_args.stop_if)
+        if stopped_by is not None:
+            res['stopped_by'] = stopped_by
+        if forked_at is not None:
+            res['forked_at'] = f'{forked_at:.2f}'
+        if self.model.verify_kernels:
+            res['kernel_error'] = f'{self.model.kernel_error:.3g}'
         params = ','.join([f'{x}={y}' for x, y in res.items()])
 
         self.logger.write(
             f'{self.logger.id}\t{time:.2f}\t{EventType.END.name}\t{len(population)}\t{params}\n'
         )
+        if snapshot_at is not None:
+            # the simulation ends before the time of the snapshot
+            self.save_state(snapshot_file, snapshot_at, population, events, trigger_events,
+                finished=True)
@@ -1,5 +1,7 @@
 from fnmatch import fnmatch
 
+from numpy.random import rand
+
 def as_float(val, msg=''):
     try:
         return float(val)
@@ -59,4 +61,37 @@ def parse_param_with_multiplier(args, subpops=None, default=None):
                 res[sp] = [x * val for x in base]
             else:
                 res[sp] = base * val
-    return res
\ No newline at end of file
+    return res
+
+class AliasTable(object):
+    '''
+    Walker's alias table that draws an index with probability proportional
+    to weights in O(1) time, after an O(n) construction.
+    '''
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = sum(weights)
+        if n == 0 or total <= 0:
+            raise ValueError(f'Positive weights are expected: {weights} provided')
+        self.prob = [x * n / total for x in weights]
+        self.alias = list(range(n))
+        small = [i for i, x in enumerate(self.prob) if x < 1]
+        large = [i for i, x in enumerate(self.prob) if x >= 1]
+        while small and large:
+            s = small.pop()
+            lg = large.pop()
+            self.alias[s] = lg
+            self.prob[lg] -= 1 - self.prob[s]
+            (small if self.prob[lg] < 1 else large).append(lg)
+        # remaining probabilities differ from 1 only by rounding errors
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def __len__(self):
+        return len(self.prob)
+
+    def sample(self):
+        u = rand() * len(self.prob)
+        i = int(u)
+        return i if u - i < self.prob[i] else self.alias[i]
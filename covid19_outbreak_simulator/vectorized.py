@@ -0,0 +1,727 @@
+import copy
+import heapq
+import math
+import subprocess
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+
+from .event import EventType
+from .model import Model
+from .plugin import BasePlugin
+from .population import parse_vicinity
+from .simulator import Simulator, format_remaining_events, parse_stop_if
+from .utils import as_float
+
+# what happens to an individual when it shows symptom
+KEEP = 0
+REMOVE = 1
+QUARANTINE = 2
+
+
+def parse_handle_symptomatic(handle_symptomatic):
+    # return method, quarantine duration and proportion of --handle-symptomatic
+    if handle_symptomatic is None:
+        handle_symptomatic = ["remove", 1]
+    if handle_symptomatic[0] in ("remove", "keep"):
+        method = REMOVE if handle_symptomatic[0] == "remove" else KEEP
+        duration = 0
+    elif handle_symptomatic[0].startswith("quarantine"):
+        method = QUARANTINE
+        if handle_symptomatic[0] == "quarantine":
+            duration = 14
+        else:
+            duration = as_float(
+                handle_symptomatic[0].split("_", 1)[1],
+                "quanrantine duration should be specified as quarantine_DURATION",
+            )
+    else:
+        raise ValueError(
+            f'Unrecognizable symptomatic case handling method: {" ".join(handle_symptomatic)}'
+        )
+    if len(handle_symptomatic) == 1:
+        proportion = 1
+    else:
+        proportion = as_float(
+            handle_symptomatic[1],
+            "Proportion in --handle-symptomatic should be a float number",
+        )
+    if proportion > 1 or proportion < 0:
+        raise ValueError(
+            f'Proportion in "--handle-symptomatic" should be a float number between 0 and 1: {proportion} provided'
+        )
+    return method, duration, proportion
+
+
+class VectorizedPopulation(object):
+    '''
+    Populations of one or more replicate simulations, used by the vectorized
+    engine. States of individuals are kept in NumPy arrays with a leading
+    replicate axis, flattened so that individual i of replicate r is at
+    index r * size + i, with NaN for events that have not happened. IDs are
+    only generated for output, which is written to the logger of each
+    replicate. Infections caused by each infected individual are drawn
+    from its transmission probabilities when it is infected, and steps at
+    which infections happen are stored as 1 in a shared buffer, at offset
+    kernel_start of each individual.
+    '''
+
+    # number of rounds of rejection sampling before infectees are selected
+    # from the list of all eligible individuals
+    max_rejections = 20
+
+    def __init__(self, popsize, models, vicinity, loggers, handle_symptomatic=None):
+        # model and logger of each replicate
+        self.models = models
+        self.loggers = loggers
+        self.replicates = len(loggers)
+        self.interval = models[0].params.simulation_interval
+        self.symptomatic_handling = parse_handle_symptomatic(handle_symptomatic)
+
+        self.names = []
+        sizes = []
+        for ps in popsize:
+            if "=" in ps:
+                name, sz = ps.split("=", 1)
+            else:
+                name = ""
+                sz = ps
+            try:
+                sizes.append(int(sz))
+            except Exception:
+                raise ValueError(
+                    f"Named population size should be name=int: {ps} provided"
+                )
+            self.names.append(name)
+        if len(set(self.names)) != len(self.names):
+            raise ValueError(f"One or more IDs are already in the population.")
+        self.vicinity = parse_vicinity(vicinity, self.names)
+        # individuals of group g are at offsets[g]:offsets[g + 1] of each
+        # replicate, and size is the size of the population of a replicate
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        self.size = int(self.offsets[-1])
+        # current size of each group in each replicate
+        self.group_sizes = np.tile(np.array(sizes, dtype=np.int64), (self.replicates, 1))
+        # replicates that have not been ended
+        self.running = np.ones(self.replicates, dtype=bool)
+
+        n = self.replicates * self.size
+        self.group = np.tile(np.repeat(np.arange(len(sizes)), sizes), self.replicates)
+        self.susceptibility = np.tile(
+            np.repeat(
+                [
+                    min(
+                        1,
+                        getattr(models[0].params, f"susceptibility_mean", 1)
+                        * getattr(models[0].params, f"susceptibility_multiplier_{name}", 1),
+                    )
+                    for name in self.names
+                ],
+                sizes,
+            ),
+            self.replicates,
+        )
+        self.present = np.ones(n, dtype=bool)
+        self.infected = np.full(n, np.nan)
+        self.recovered = np.full(n, np.nan)
+        self.show_symptom = np.full(n, np.nan)
+        self.quarantined = np.full(n, np.nan)
+        self.symptomatic = np.zeros(n, dtype=bool)
+        self.r0 = np.full(n, np.nan)
+        # scheduled time of symptom, recovery and action at symptom
+        self.symptom_time = np.full(n, np.inf)
+        self.symptom_action = np.zeros(n, dtype=np.int8)
+        self.recover_time = np.full(n, np.inf)
+        # steps of infections at kernel_start:kernel_start + kernel_stop
+        self.kernel_start = np.zeros(n, dtype=np.int64)
+        self.kernel_stop = np.zeros(n, dtype=np.int64)
+        self._kernels = np.zeros(4096)
+        self._kernel_size = 0
+        # individuals who are infected, not removed and not recovered
+        self.active = np.zeros(0, dtype=np.int64)
+        self._infecting = []
+        # (till, idx) of quarantined individuals
+        self._releases = []
+
+        # number of infected and recovered individuals in the population,
+        # and total number of infections of each replicate
+        self.n_infected = np.zeros(self.replicates, dtype=np.int64)
+        self.n_recovered = np.zeros(self.replicates, dtype=np.int64)
+        self.n_infections = np.zeros(self.replicates, dtype=np.int64)
+
+    def popsize(self, rep):
+        return int(self.group_sizes[rep].sum())
+
+    def id(self, idx):
+        grp = self.group[idx]
+        local = idx % self.size - self.offsets[grp]
+        return f"{self.names[grp]}_{local}" if self.names[grp] else str(local)
+
+    def ids(self, idxs):
+        return [self.id(x) for x in idxs]
+
+    def logger(self, idx):
+        return self.loggers[idx // self.size]
+
+    def members(self, grp=None):
+        # present individuals of group grp (all groups if unspecified) in
+        # replicates that are running
+        low, high = (0, self.size) if grp is None else (self.offsets[grp], self.offsets[grp + 1])
+        idxs = (np.flatnonzero(self.running)[:, None] * self.size + np.arange(low, high)).ravel()
+        return idxs[self.present[idxs]]
+
+    def split(self, idxs):
+        # (replicate, logger, individuals of replicate in idxs) for running replicates
+        idxs = np.asarray(idxs, dtype=np.int64)
+        reps = idxs // self.size
+        for rep in np.flatnonzero(self.running):
+            yield rep, self.loggers[rep], idxs[reps == rep]
+
+    def index(self, ID, rep=0):
+        # index of individual with ID in replicate rep
+        if "_" in ID:
+            name, local = ID.rsplit("_", 1)
+        else:
+            name, local = "", ID
+        try:
+            grp = self.names.index(name)
+            local = int(local)
+        except ValueError:
+            raise ValueError(f"Invalid ID {ID}")
+        if local < 0 or local >= self.offsets[grp + 1] - self.offsets[grp]:
+            raise ValueError(f"Invalid ID {ID}")
+        return int(rep * self.size + self.offsets[grp] + local)
+
+    def _add_kernel(self, prob):
+        if self._kernel_size + len(prob) > len(self._kernels):
+            # keep only kernels of active individuals, and double the size
+            # of the buffer if it is still more than half full
+            active = np.concatenate([self.active, self._infecting]).astype(np.int64)
+            active = active[np.argsort(self.kernel_start[active])]
+            starts = self.kernel_start[active]
+            stops = self.kernel_stop[active]
+            kernels = self._kernels
+            if 2 * (stops.sum() + len(prob)) > len(kernels):
+                self._kernels = np.zeros(2 * (len(kernels) + len(prob)))
+            self._kernel_size = 0
+            for idx, start, stop in zip(active, starts, stops):
+                self._kernels[self._kernel_size:self._kernel_size + stop] = kernels[start:start + stop]
+                self.kernel_start[idx] = self._kernel_size
+                self._kernel_size += stop
+        start = self._kernel_size
+        self._kernels[start:start + len(prob)] = prob
+        self._kernel_size += len(prob)
+        return start
+
+    def set_recovered(self, idxs, infected=-10.0, recovered=-2.0):
+        # individuals who have been infected and recovered before simulation
+        idxs = np.array([x for x in idxs if np.isnan(self.infected[x])], dtype=np.int64)
+        self.infected[idxs] = infected
+        self.recovered[idxs] = recovered
+        np.add.at(self.n_infected, idxs // self.size, 1)
+        np.add.at(self.n_recovered, idxs // self.size, 1)
+
+    def infect(self, idxs, time, by=None, leadtime=None):
+        '''Infect individuals idxs at time, by infectors by (None or -1 for
+        infections from the community).'''
+        # individuals infected by this call, who are not yet active
+        new_infected = self._infecting = []
+        for i, idx in enumerate(idxs):
+            infector = None if by is None or by[i] < 0 else by[i]
+            by_id = "." if infector is None else self.id(infector)
+            logger = self.logger(idx)
+            if not self.present[idx]:
+                logger.write(
+                    f'{logger.id}\t{time:.2f}\t{EventType.WARNING.name}\t{self.id(idx)}\tmsg=INFECTION target no longer exists\n'
+                )
+                continue
+            if not np.isnan(self.infected[idx]):
+                logger.write(
+                    f"{logger.id}\t{time:.2f}\t{EventType.INFECTION_IGNORED.name}\t{self.id(idx)}\tby={by_id}\n"
+                )
+                continue
+            if self.susceptibility[idx] < 1 and np.random.rand() > self.susceptibility[idx]:
+                logger.write(
+                    f"{logger.id}\t{time:.2f}\t{EventType.INFECTION_FAILED.name}\t{self.id(idx)}\tby={by_id},reson=susceptibility\n"
+                )
+                continue
+            self._infect_one(idx, time, infector, leadtime)
+            new_infected.append(idx)
+        self._infecting = []
+        if new_infected:
+            self.active = np.concatenate([self.active, new_infected])
+        return new_infected
+
+    def _infect_one(self, idx, time, by, leadtime):
+        name = self.names[self.group[idx]]
+        rep = idx // self.size
+        model = self.models[rep]
+        logger = self.loggers[rep]
+        symptomatic = not model.draw_is_asymptomatic()
+        r0 = model.draw_random_r0(symptomatic=symptomatic, group=name)
+        r0_multiplier = getattr(
+            model.params,
+            f"{'symptomatic' if symptomatic else 'asymptomatic'}_r0_multiplier_{name}",
+            1.0,
+        )
+        if symptomatic:
+            incu = model.draw_random_incubation_period(group=name)
+            infect_params = model.draw_infection_params(symptomatic=True)
+            (x_grid, trans_prob) = model.get_symptomatic_transmission_probability(
+                incu, r0 * r0_multiplier, infect_params
+            )
+        else:
+            incu = -1
+            infect_params = model.draw_infection_params(symptomatic=False)
+            (x_grid, trans_prob) = model.get_asymptomatic_transmission_probability(
+                r0 * r0_multiplier, infect_params
+            )
+
+        if leadtime is not None and leadtime != 0:
+            if by is not None:
+                raise ValueError(
+                    "leadtime is only allowed during initialization of infection event (no by option.)"
+                )
+            if leadtime == "any" or (leadtime == "asymptomatic" and not symptomatic):
+                lead_time = np.random.uniform(0, x_grid[-1])
+            elif leadtime == "asymptomatic":
+                lead_time = np.random.uniform(0, incu)
+            else:
+                lead_time = min(
+                    as_float(
+                        leadtime,
+                        "--leadtime can only be any, asymptomatic, or a fixed number",
+                    ),
+                    x_grid[-1],
+                )
+        else:
+            lead_time = 0
+
+        self.infected[idx] = time - lead_time
+        self.symptomatic[idx] = symptomatic
+        self.r0[idx] = r0
+        self.recover_time[idx] = time - lead_time + x_grid[-1]
+        self.n_infected[rep] += 1
+        self.n_infections[rep] += 1
+
+        kept = True
+        if symptomatic:
+            symp_time = time - lead_time + incu
+            method, duration, proportion = self.symptomatic_handling
+            if not np.isnan(self.quarantined[idx]) and self.quarantined[idx] > symp_time:
+                # show symptom during quarantine
+                pass
+            elif method == KEEP:
+                kept = np.random.uniform(0, 1) <= proportion
+            else:
+                kept = proportion != 1 and np.random.uniform(0, 1) > proportion
+            self.symptom_action[idx] = KEEP if kept else method
+            if symp_time < time:
+                self.show_symptom[idx] = symp_time
+                if self.symptom_action[idx] == REMOVE:
+                    logger.write(
+                        f'{logger.id}\t{time:.2f}\t{EventType.WARNING.name}\t{self.id(idx)}\tmsg="Individual not removed before it show symptom before {time}"\n'
+                    )
+                elif self.symptom_action[idx] == QUARANTINE:
+                    self._quarantine(idx, symp_time + duration)
+            else:
+                self.symptom_time[idx] = symp_time
+        else:
+            self.symptom_time[idx] = np.inf
+        # infect only before removal or quarantine, and after the start of
+        # the simulation. Infections are drawn now so that the number of
+        # infections is known, and happen at their steps unless the infector
+        # is quarantined or removed.
+        self.kernel_stop[idx] = (
+            len(x_grid) if kept else np.searchsorted(x_grid, incu, side="left")
+        )
+        stop = self.kernel_stop[idx]
+        infected = np.random.uniform(size=stop) < trans_prob[:stop]
+        infected[x_grid[:stop] < lead_time] = False
+        self.kernel_start[idx] = self._add_kernel(infected.astype(float))
+        x_infected = x_grid[:stop][infected]
+
+        if by is not None:
+            params = [f"by={self.id(by)}"]
+        elif lead_time > 0:
+            params = [f"leadtime={lead_time:.2f}"]
+        else:
+            params = []
+        params.extend([f"r0={r0:.2f}", f"r0_multiplier={r0_multiplier:.2f}"])
+        if symptomatic:
+            # infections during an existing quarantine are avoided
+            n_avoided = 0
+            if not np.isnan(self.quarantined[idx]):
+                n_avoided = int((time - lead_time + x_infected < self.quarantined[idx]).sum())
+            n_presymptomatic = int((x_infected < incu).sum())
+            params.extend([
+                f"r={len(x_infected) - n_avoided}",
+                f"r_presym={n_presymptomatic}",
+                f"r_sym={len(x_infected) - n_presymptomatic}",
+                f"incu={incu:.2f}",
+            ])
+        else:
+            params.extend([f"r={len(x_infected)}", f"r_asym={len(x_infected)}"])
+        logger.write(
+            f'{logger.id}\t{time:.2f}\t{EventType.INFECTION.name}\t{self.id(idx)}\t{",".join(params)}\n'
+        )
+
+    def _quarantine(self, idx, till):
+        self.quarantined[idx] = till
+        heapq.heappush(self._releases, (till, idx))
+
+    def quarantine(self, idxs, time, till):
+        for idx in idxs:
+            logger = self.logger(idx)
+            if not self.present[idx]:
+                logger.write(
+                    f'{logger.id}\t{time:.2f}\t{EventType.WARNING.name}\t{self.id(idx)}\tmsg=QUARANTINE target no longer exists\n'
+                )
+                continue
+            logger.write(
+                f'{logger.id}\t{time:.2f}\t{EventType.QUARANTINE.name}\t{self.id(idx)}\ttill={till:.2f}\n'
+            )
+            self._quarantine(idx, till)
+
+    def remove(self, idx):
+        rep = idx // self.size
+        self.present[idx] = False
+        self.group_sizes[rep, self.group[idx]] -= 1
+        if not np.isnan(self.infected[idx]):
+            self.n_infected[rep] -= 1
+        if not np.isnan(self.recovered[idx]):
+            self.n_recovered[rep] -= 1
+
+    def counter(self, name):
+        # value of a counter used by stop conditions, for each replicate
+        if name == 'n_infected':
+            return self.n_infected
+        elif name == 'n_recovered':
+            return self.n_recovered
+        elif name == 'n_active':
+            return self.n_infected - self.n_recovered
+        elif name == 'popsize':
+            return self.group_sizes.sum(axis=1)
+        raise ValueError(f'Unrecognized counter {name}')
+
+    def stop(self, rep):
+        # end the simulation of replicate rep
+        self.running[rep] = False
+        self.active = self.active[self.active // self.size != rep]
+
+    def idle(self):
+        # running replicates without active individuals or quarantines
+        busy = np.zeros(self.replicates, dtype=bool)
+        busy[self.active // self.size] = True
+        for till, idx in self._releases:
+            if self.quarantined[idx] == till:
+                busy[idx // self.size] = True
+        return self.running & ~busy
+
+    def update(self, time):
+        '''Release individuals from quarantine, and process symptoms and
+        recoveries of active individuals that happen by time.'''
+        while self._releases and self._releases[0][0] <= time:
+            till, idx = heapq.heappop(self._releases)
+            if self.quarantined[idx] != till:
+                # quarantined again
+                continue
+            self.quarantined[idx] = np.nan
+            if self.present[idx] and self.running[idx // self.size]:
+                logger = self.logger(idx)
+                logger.write(
+                    f'{logger.id}\t{time:.2f}\t{EventType.REINTEGRATION.name}\t{self.id(idx)}\tsucc=True\n'
+                )
+        if not len(self.active):
+            return
+        method, duration, proportion = self.symptomatic_handling
+        for idx in self.active[self.symptom_time[self.active] <= time]:
+            rep = idx // self.size
+            logger = self.loggers[rep]
+            self.symptom_time[idx] = np.inf
+            self.show_symptom[idx] = time
+            logger.write(
+                f'{logger.id}\t{time:.2f}\t{EventType.SHOW_SYMPTOM.name}\t{self.id(idx)}\t.\n'
+            )
+            if self.symptom_action[idx] == REMOVE:
+                self.remove(idx)
+                logger.write(
+                    f'{logger.id}\t{time:.2f}\t{EventType.REMOVAL.name}\t{self.id(idx)}\tpopsize={self.popsize(rep)}\n'
+                )
+            elif self.symptom_action[idx] == QUARANTINE:
+                self.quarantine([idx], time, time + duration)
+        for idx in self.active[self.recover_time[self.active] <= time]:
+            if not self.present[idx]:
+                continue
+            rep = idx // self.size
+            logger = self.loggers[rep]
+            self.recovered[idx] = time
+            self.n_recovered[rep] += 1
+            logger.write(
+                f'{logger.id}\t{time:.2f}\t{EventType.RECOVER.name}\t{self.id(idx)}\trecovered={self.n_recovered[rep]},infected={self.n_infected[rep]},popsize={self.popsize(rep)}\n'
+            )
+        self.active = self.active[
+            self.present[self.active] & np.isnan(self.recovered[self.active])
+        ]
+
+    def remaining_events(self, rep, time):
+        '''Number of events of each type that would happen after time in
+        replicate rep, and the number of infectors with pending infections,
+        in the same way as pending events are summarized by the event
+        engine.'''
+        remaining_events = defaultdict(int)
+        n_infectors = 0
+        for idx in self.active[self.active // self.size == rep]:
+            # infections at steps after the current step
+            k = max(int(np.rint((time - self.infected[idx]) / self.interval)) + 1, 0)
+            start = self.kernel_start[idx]
+            n = int(np.count_nonzero(self._kernels[start + k:start + self.kernel_stop[idx]]))
+            if n:
+                remaining_events['INFECTION'] += n
+                n_infectors += 1
+            if self.symptom_time[idx] > time and np.isfinite(self.symptom_time[idx]):
+                remaining_events['SHOW_SYMPTOM'] += 1
+                if self.symptom_action[idx] == REMOVE:
+                    remaining_events['REMOVAL'] += 1
+                elif self.symptom_action[idx] == QUARANTINE:
+                    remaining_events['QUARANTINE'] += 1
+            if self.recover_time[idx] > time:
+                remaining_events['RECOVER'] += 1
+        n_releases = sum(idx // self.size == rep and self.present[idx] and self.quarantined[idx] == till
+                         for till, idx in self._releases)
+        if n_releases:
+            remaining_events['REINTEGRATION'] = n_releases
+        return remaining_events, n_infectors
+
+    def next_time(self):
+        # time of the next symptom, recovery or release from quarantine
+        times = [self._releases[0][0]] if self._releases else []
+        if len(self.active):
+            times.append(self.symptom_time[self.active].min())
+            times.append(self.recover_time[self.active].min())
+        return min(times) if times else None
+
+    def is_infectious(self, time):
+        # if any individual could infect others at time
+        if not len(self.active):
+            return False
+        k = np.rint((time - self.infected[self.active]) / self.interval)
+        return bool(np.any(k < self.kernel_stop[self.active]))
+
+    def spread(self, time):
+        '''Infections caused by active individuals in the step at time, which
+        are drawn when the individuals are infected, and return the number
+        of infections.'''
+        if not len(self.active):
+            return 0
+        k = np.rint((time - self.infected[self.active]) / self.interval).astype(np.int64)
+        ok = (k >= 0) & (k < self.kernel_stop[self.active]) & np.isnan(self.quarantined[self.active])
+        infectors = self.active[ok]
+        infectors = infectors[self._kernels[self.kernel_start[infectors] + k[ok]] > 0]
+        if not len(infectors):
+            return 0
+        infectees = self.select(infectors, time)
+        for by in infectors[infectees < 0]:
+            logger = self.logger(by)
+            logger.write(
+                f'{logger.id}\t{time:.2f}\t{EventType.INFECTION_FAILED.name}\tNone\tby={self.id(by)},reson=no_infectee\n'
+            )
+        self.infect(infectees[infectees >= 0], time, by=infectors[infectees >= 0])
+        return len(infectors)
+
+    def eligible(self, idxs, time):
+        # individuals who can be infected
+        return self.present[idxs] & np.isnan(self.quarantined[idxs])
+
+    def select(self, infectors, time, replicates=None):
+        '''Select an infectee for each infector (-1 for infections from the
+        community), and return -1 if no one can be infected. Infectees are
+        selected from the replicates of infectors, or from replicates
+        (default to the first one) for infections from the community.'''
+        n = len(infectors)
+        if replicates is None:
+            replicates = np.zeros(n, dtype=np.int64)
+        reps = np.where(infectors >= 0, infectors // self.size, replicates)
+        # draw group of infectees, with -1 for the entire population
+        groups = np.full(n, -1, dtype=np.int64)
+        infector_groups = np.where(infectors >= 0, self.group[infectors], -1)
+        for rep, grp in sorted(set(zip(reps.tolist(), infector_groups.tolist()))):
+            name = "" if grp < 0 else self.names[grp]
+            if name not in self.vicinity:
+                continue
+            freq = dict(self.vicinity[name])
+            for i, x in enumerate(self.names):
+                if x not in freq:
+                    freq[x] = self.group_sizes[rep, i]
+            total = sum(freq.values())
+            selected = (infector_groups == grp) & (reps == rep)
+            groups[selected] = np.random.choice(
+                len(self.names),
+                np.count_nonzero(selected),
+                p=[freq[x] / total for x in self.names],
+            )
+        low = reps * self.size + np.where(groups >= 0, self.offsets[groups], 0)
+        high = reps * self.size + np.where(groups >= 0, self.offsets[groups + 1], self.size)
+        infectees = np.full(n, -1, dtype=np.int64)
+        # rejection sampling of eligible individuals other than the infector
+        pending = np.flatnonzero(high > low)
+        for i in range(self.max_rejections):
+            if not len(pending):
+                break
+            cand = np.random.randint(low[pending], high[pending])
+            ok = self.eligible(cand, time) & (cand != infectors[pending])
+            infectees[pending[ok]] = cand[ok]
+            pending = pending[~ok]
+        for i in pending:
+            cand = np.arange(low[i], high[i])
+            cand = cand[self.eligible(cand, time) & (cand != infectors[i])]
+            if len(cand):
+                infectees[i] = np.random.choice(cand)
+        return infectees
+
+
+class VectorizedSimulator(Simulator):
+    '''
+    Simulator that advances the population in steps of the simulation
+    interval, with infections of each step drawn for all infectors at once
+    from their transmission probabilities. Plugins are applied through
+    their apply_vectorized function. A batch of replicates can be simulated
+    in lock-step, with output of each replicate written to its own logger.
+    '''
+
+    def simulate(self, id):
+        self.logger.id = id
+        self.simulate_batch([self.logger])
+
+    def simulate_batch(self, loggers):
+        '''Simulate a replicate for each logger, with IDs of replicates
+        set as attribute id of the loggers.'''
+        if self.simu_args.snapshot_at is not None or self.simu_args.fork_from or self.simu_args.checkpoint_dir:
+            raise ValueError('Options --snapshot-at, --fork-from and --checkpoint-dir are not supported by the vectorized engine.')
+        models = [Model(copy.copy(self.params)) for x in loggers]
+        for model in models:
+            model.draw_prop_asym_carriers()
+        self.model = models[0]
+
+        population = VectorizedPopulation(
+            popsize=self.simu_args.popsize,
+            models=models,
+            vicinity=self.simu_args.vicinity,
+            loggers=loggers,
+            handle_symptomatic=self.simu_args.handle_symptomatic,
+        )
+        interval = self.params.simulation_interval
+
+        infectors = [] if self.simu_args.infectors is None else self.simu_args.infectors
+        for infector in infectors:
+            try:
+                population.index(infector)
+            except ValueError:
+                raise ValueError(f'Invalid ID for carrier {infector}')
+
+        init_events, trigger_events = self.get_plugin_events()
+        if trigger_events:
+            raise ValueError('Option --trigger-by is not supported by the vectorized engine.')
+        for evt in init_events:
+            if type(evt.plugin).apply_vectorized is BasePlugin.apply_vectorized:
+                raise ValueError(f'Plugin {evt.plugin} does not support the vectorized engine.')
+        # plugin calls ordered by time, and by the order they are created
+        plugin_events = [(evt.time, i, evt) for i, evt in enumerate(init_events)]
+        heapq.heapify(plugin_events)
+        n_plugin_events = len(plugin_events)
+
+        for logger in loggers:
+            start_params = {
+                'id': logger.id,
+                'time': datetime.now().strftime("%m/%d/%Y-%H:%M:%S"),
+                'args': subprocess.list2cmdline(self.cmd)
+            }
+            start_params = ','.join([f'{x}={y}' for x, y in start_params.items()])
+
+            logger.write(
+                f'{logger.id}\t0.00\t{EventType.START.name}\t.\t{start_params}\n'
+            )
+        population.infect([population.index(x, rep)
+            for rep in range(len(loggers)) for x in infectors],
+            0, leadtime=self.simu_args.leadtime)
+
+        time_conditions, stop_conditions = parse_stop_if(self.simu_args.stop_if)
+        step = 0
+        while True:
+            time = step * interval
+            stopped_by = next((x for x in time_conditions if x(time)), None)
+            if stopped_by is not None:
+                time = stopped_by.value
+                for rep in np.flatnonzero(population.running):
+                    self.end_replicate(population, rep, time, len(plugin_events), stopped_by)
+                break
+            # plugins are applied before or after core events of the step
+            due = []
+            while plugin_events and plugin_events[0][0] <= time + interval / 2:
+                due.append(heapq.heappop(plugin_events)[2])
+            n_infections = population.n_infections.copy()
+            n_rescheduled = 0
+            for before_core in (True, False):
+                if not before_core:
+                    population.update(time)
+                    population.spread(time)
+                for evt in due:
+                    if evt.priority != before_core:
+                        continue
+                    for new_evt in evt.plugin.apply_plugin(evt.time, population, evt.args, vectorized=True):
+                        heapq.heappush(plugin_events, (new_evt.time, n_plugin_events, new_evt))
+                        n_plugin_events += 1
+                        n_rescheduled += 1
+            n_infections = population.n_infections - n_infections
+
+            # counters of replicates are checked after each step
+            for cond in stop_conditions:
+                for rep in np.flatnonzero(population.running & cond(population.counter(cond.name))):
+                    self.end_replicate(population, rep, time, len(plugin_events), cond)
+
+            # end replicates with nothing to do other than calling plugins
+            # that are called periodically
+            if not plugin_events:
+                ended = population.idle()
+            elif not time_conditions and len(plugin_events) == n_rescheduled:
+                ended = population.idle() & (n_infections == 0)
+            else:
+                ended = np.zeros(len(loggers), dtype=bool)
+            for rep in np.flatnonzero(ended):
+                self.end_replicate(population, rep, time, len(plugin_events))
+            if not population.running.any():
+                break
+
+            if population.is_infectious(time + interval):
+                step += 1
+                continue
+            # jump to the step of the next event
+            next_time = population.next_time()
+            if plugin_events:
+                next_time = plugin_events[0][0] if next_time is None else min(next_time, plugin_events[0][0])
+            step = step + 1 if next_time is None else max(step + 1, int(math.ceil(next_time / interval - 0.5)))
+
+    def end_replicate(self, population, rep, time, n_plugin_events, stopped_by=None):
+        logger = population.loggers[rep]
+        remaining_events, n_infectors = population.remaining_events(rep, time)
+        if n_plugin_events:
+            remaining_events['PLUGIN'] = n_plugin_events
+        remaining_events = format_remaining_events(remaining_events, n_infectors)
+        res = {
+            'popsize': population.popsize(rep),
+            'prop_asym': f'{population.models[rep].params.prop_asym_carriers:.3f}',
+            'time': datetime.now().strftime("%m/%d/%Y-%H:%M:%S"),
+        }
+        if remaining_events:
+            res['remaining_events'] = remaining_events
+        if self.simu_args.stop_if:
+            res['stop_if'] = ';'.join(self.simu_args.stop_if)
+        if stopped_by is not None:
+            res['stopped_by'] = stopped_by
+        params = ','.join([f'{x}={y}' for x, y in res.items()])
+
+        logger.write(
+            f'{logger.id}\t{time:.2f}\t{EventType.END.name}\t{population.popsize(rep)}\t{params}\n'
+        )
+        population.stop(rep)
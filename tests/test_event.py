@@ -1,6 +1,26 @@
+import numpy as np
 from covid19_outbreak_simulator.event import Event, EventType
 
 
 def test_event_infection(simulator):
     event = Event(
         0, EventType.INFECTION, target=None, by=None, logger=simulator.logger)
+
+
+def test_event_shared_kwargs(simulator):
+    kwargs = {'by': '1', 'handle_symptomatic': ['remove']}
+    evts = [
+        Event.with_shared_kwargs(x, EventType.INFECTION, None,
+                                 simulator.logger, kwargs) for x in range(3)
+    ]
+    assert all(x.kwargs is kwargs for x in evts)
+    assert [x.time for x in evts] == [0, 1, 2]
+    assert not hasattr(evts[0], '__dict__')
+
+
+def test_event_numpy_integer_target(simulator):
+    event = Event(
+        0, EventType.INFECTION, target=np.int64(3), by=None,
+        logger=simulator.logger)
+    assert type(event.target) is int
+    assert event.target == 3
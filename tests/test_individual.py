@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 from itertools import product
 from covid19_outbreak_simulator.population import Individual
@@ -17,11 +18,9 @@ def test_individual(default_model, logger):
 def test_quarantine(individual):
     res = individual.quarantine(till=2)
 
+    # individuals are released by their population
     assert individual.quarantined == 2
-    assert len(res) == 1
-    assert res[0].action == EventType.REINTEGRATION
-    assert res[0].time == 2
-    assert res[0].target == individual.id
+    assert not res
 
     res = individual.reintegrate()
 
@@ -139,3 +138,87 @@ def test_asymptomatic_infect(individual_factory, by, handle_symptomatic,
         assert ind1.infected == 5.0
     assert ind1.r0 is not None
     assert ind1.incubation_period is not None
+
+
+def test_lazy_schedule(individual_factory):
+    ind = individual_factory(id='1')
+    ind.model.draw_prop_asym_carriers()
+    x_infected = np.array([0.5, 1.5, 2.0])
+
+    evts = ind._schedule_infections(5.0, x_infected, ['keep'])
+    assert len(evts) == 3
+    # only the first infection is scheduled
+    ind.model.lazy_schedule = True
+    evts = ind._schedule_infections(5.0, x_infected, ['keep'])
+    assert len(evts) == 1
+    assert evts[0].action == EventType.INFECTION
+    assert evts[0].time == 5.5
+    schedule = evts[0].kwargs['schedule']
+    assert len(schedule) == 2
+    assert schedule.next_event().time == 6.5
+    assert schedule.next_event().time == 7.0
+    assert schedule.next_event() is None
+    assert len(schedule) == 0
+    # infections during quarantine are still avoided
+    ind.quarantine(till=6.0)
+    evts = ind._schedule_infections(5.0, x_infected, ['keep'])
+    assert [x.action for x in evts] == [EventType.INFECTION_AVOIDED, EventType.INFECTION]
+    assert evts[1].time == 6.5
+    assert len(evts[1].kwargs['schedule']) == 1
+
+
+@pytest.mark.parametrize('symptomatic', [True, False])
+def test_transmission_kernel(individual_factory, symptomatic):
+    ind = individual_factory(id='1')
+    model = ind.model
+    model.draw_prop_asym_carriers()
+    if symptomatic:
+        ind.symptomatic_infect(0, by=None)
+        x_grid, trans_prob = model.get_symptomatic_transmission_probability(
+            ind.incubation_period, ind.r0, ind.infect_params)
+    else:
+        ind.asymptomatic_infect(0, by=None)
+        x_grid, trans_prob = model.get_asymptomatic_transmission_probability(
+            ind.r0, ind.infect_params)
+    # kernels are computed once at infection
+    assert list(ind.kernel * ind.r0) == list(trans_prob)
+    assert ind.peak_idx == trans_prob.argmax()
+    assert ind.viral_load(ind.peak_idx * model.params.simulation_interval) > 0
+    assert ind.transmissibility((len(x_grid) + 1) * model.params.simulation_interval) == 0
+    assert ind.viral_load(ind.clearance_time()) == 0
+
+
+@pytest.mark.parametrize('symptomatic', [True, False])
+def test_continuous_infections(individual_factory, symptomatic):
+    ind = individual_factory(id='1')
+    model = ind.model
+    model.draw_prop_asym_carriers()
+    model.infection_sampler = 'continuous'
+    model.params.simulation_interval = 1 / 1440
+    if symptomatic:
+        evts = ind.symptomatic_infect(0, by=None, handle_symptomatic=['keep'])
+    else:
+        evts = ind.asymptomatic_infect(0, by=None, leadtime=1)
+    # kernels on the grid are computed only when they are accessed
+    assert ind._kernel is None
+    assert ind.clearance_time() >= ind.duration
+    recover = [x for x in evts if x.action == EventType.RECOVER][0]
+    assert recover.time == pytest.approx(ind.duration - (0 if symptomatic else 1))
+    times = [x.time for x in evts if x.action == EventType.INFECTION]
+    assert times == sorted(times)
+    assert all(0 <= x <= recover.time for x in times)
+    assert ind.viral_load(ind.infected + ind.peak_idx * model.params.simulation_interval) > 0
+    assert ind._kernel is not None
+    assert ind.viral_load(ind.clearance_time()) == 0
+
+
+def test_kernel_tolerance(default_model):
+    default_model.kernel_tolerance = 0.1
+    default_model.verify_kernels = True
+    # kernels of parameters on the same point of the grid are shared
+    kernel = default_model.get_transmission_kernel(True, 5.02, [3.04])[1]
+    assert default_model.get_transmission_kernel(True, 4.98, [2.97])[1] is kernel
+    assert default_model.get_transmission_kernel(False, 5.02, [3.02])[1] is not kernel
+    assert kernel.sum() == pytest.approx(1)
+    # and the largest difference from exact kernels is recorded
+    assert 0 < default_model.kernel_error < 0.01
@@ -3,9 +3,12 @@
 
 import pytest
 import math
+from itertools import product
 from scipy.stats import norm
 import numpy as np
-from covid19_outbreak_simulator.utils import parse_param_with_multiplier
+from covid19_outbreak_simulator.model import Model, norm_pdf
+from covid19_outbreak_simulator.utils import (AliasTable,
+                                              parse_param_with_multiplier)
 
 def test_multiplier():
     res = parse_param_with_multiplier(['2', 'A=1.2', 'B=0.8'], subpops=['A', 'B'])
@@ -55,6 +58,19 @@ def test_multiplier():
         parse_param_with_multiplier(['1', 'A=1.2e'], subpops=['A', 'B'])
 
 
+def test_alias_table():
+    weights = [1, 0, 3, 6]
+    table = AliasTable(weights)
+    assert len(table) == 4
+    counts = np.bincount([table.sample() for i in range(20000)], minlength=4)
+    assert counts[1] == 0
+    assert np.allclose(counts / 20000, [0.1, 0, 0.3, 0.6], atol=0.02)
+    assert AliasTable([5]).sample() == 0
+
+    with pytest.raises(ValueError):
+        AliasTable([0, 0])
+
+
 def test_unknown_param(params):
     with pytest.raises(ValueError):
         params.set('unknown', 'value', '0.3')
@@ -156,6 +172,60 @@ def test_get_normal_symptomatic_transmission_probability(default_model):
     assert math.fabs(sum(r) / N) - R0 < 0.05
 
 
+def test_norm_pdf():
+    x = np.linspace(0, 20, 481)
+    assert np.allclose(norm_pdf(x, 3.3, 1.7), norm(3.3, 1.7).pdf(x))
+    assert np.isnan(norm_pdf(x, 3.3, 0.0)).all()
+    # closed form of sd_left of the normal symptomatic model
+    sd_left = 4 / Model.z_99
+    assert norm.cdf(8, loc=4, scale=sd_left) == pytest.approx(0.99)
+
+
+@pytest.mark.parametrize('sampler', ['bernoulli', 'thinning', 'poisson'])
+def test_draw_infections(default_model, sampler):
+    default_model.infection_sampler = sampler
+    x_grid, prob = default_model.get_symptomatic_transmission_probability(
+        5, 2, default_model.draw_infection_params(symptomatic=True))
+    N = 10000
+    infected = np.array([default_model.draw_infections(prob) for i in range(N)])
+    assert infected.shape == (N, len(x_grid))
+    # number of infections and times of infections follow prob
+    assert math.fabs(infected.sum() / N - 2) < 0.05
+    assert math.fabs((infected.sum(axis=0) * x_grid).sum() / infected.sum() -
+        (prob * x_grid).sum() / 2) < 0.05
+    if sampler != 'poisson':
+        assert infected.max() == 1
+        assert math.fabs(infected.sum(axis=1).var() - (prob * (1 - prob)).sum()) < 0.1
+    assert not default_model.draw_infections(np.zeros(10)).any()
+
+
+@pytest.mark.parametrize('symptomatic,name', list(product([True, False], ['normal', 'piecewise'])))
+def test_continuous_kernel(default_model, symptomatic, name):
+    if symptomatic:
+        default_model.params.set_symptomatic_transmissibility_model([name])
+    else:
+        default_model.params.set_asymptomatic_transmissibility_model([name])
+    default_model.params.simulation_interval = 1 / 1440
+    params = default_model.draw_infection_params(symptomatic=symptomatic)
+    x_grid, prob = default_model.get_transmission_kernel(symptomatic, 5, params)
+    kernel = default_model.get_continuous_kernel(symptomatic, 5, params)
+    # the continuous kernel is the limit of kernels on fine grids
+    assert kernel.duration == pytest.approx(x_grid[-1])
+    cdf = np.array([kernel.cdf(x) for x in x_grid])
+    assert np.abs(cdf - np.cumsum(prob)).max() < 0.01
+    assert kernel.cdf(0) == 0 and kernel.cdf(kernel.duration) == pytest.approx(1)
+    support = (cdf > 0.001) & (cdf < 0.999)
+    assert np.allclose(kernel.ppf(cdf[support]), x_grid[support], atol=1e-3)
+    # infections in [start, stop) with mean R0 times their probability
+    N = 10000
+    times = [kernel.sample(2, 1, 6) for i in range(N)]
+    assert all(np.all(np.diff(x) >= 0) for x in times)
+    times = np.concatenate(times)
+    assert times.min() >= 1 and times.max() <= 6
+    assert math.fabs(len(times) / N - 2 * (kernel.cdf(6) - kernel.cdf(1))) < 0.05
+    assert not len(kernel.sample(2, 6, 6))
+
+
 def test_get_normal_asymptomatic_transmission_probability(default_model):
 
     R0 = default_model.draw_random_r0(symptomatic=False)
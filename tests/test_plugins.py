@@ -217,3 +217,22 @@ def test_plugin_testing():
 
     main(['--jobs', '1', '--repeats', '100', '--plugin', 'testing', '1', '2',
         '--turnaround-time', '2'])
+
+
+def test_plugin_testing_ids(population_factory, logger):
+    from types import SimpleNamespace
+    from covid19_outbreak_simulator.event import EventType
+    from covid19_outbreak_simulator.plugins.testing import testing
+
+    pop = population_factory(popsize=['A=10', 'B=10'])
+    pop.model.draw_prop_asym_carriers()
+    plugin = testing(simulator=SimpleNamespace(logger=logger))
+    args = plugin.get_parser().parse_args(['A_1', 'B_2', '--specificity', '0',
+        '--handle-positive', 'quarantine_7'])
+    evts = plugin.apply(1.0, pop, args)
+    # uninfected individuals are tested without Individual objects
+    assert all(x is None for x in pop.by_row)
+    assert [(x.action, x.target) for x in evts] == [
+        (EventType.QUARANTINE, pop.row('A_1')), (EventType.QUARANTINE, pop.row('B_2'))]
+    with pytest.raises(KeyError):
+        plugin.apply(1.0, pop, plugin.get_parser().parse_args(['C_1']))
@@ -1,5 +1,7 @@
 import pytest
+import numpy as np
 from itertools import product
+from covid19_outbreak_simulator.population import Individual
 from covid19_outbreak_simulator.simulator import Population
 
 
@@ -33,13 +35,222 @@ def test_remove(population_factory):
     assert pop.max_ids['B'] == 200
 
 
+def test_counters(population_factory):
+    pop = population_factory(popsize=['A=100', 'B=200'])
+    pop['A_1'].infected = 0.0
+    pop['A_2'].infected = 1.5
+    pop['A_2'].recovered = 10.0
+    pop['B_3'].infected = -10.0
+    pop['B_3'].recovered = -2.0
+    assert pop.counter('n_infected') == 3
+    assert pop.counter('n_recovered') == 2
+    assert pop.counter('n_active') == 1
+
+    pop.remove('A_2')
+    assert pop.counter('n_infected') == 2
+    assert pop.counter('n_recovered') == 1
+    assert pop.counter('popsize') == 299
+    with pytest.raises(ValueError):
+        pop.counter('n_unknown')
+
+
+def test_arrays(population_factory):
+    pop = population_factory(popsize=['A=10', 'B=20'])
+    assert pop.size == 30
+    assert np.isnan(pop.infected[:30]).all()
+    assert list(pop.group[pop.members('B')]) == [1] * 20
+
+    # individuals are views of rows of the arrays
+    ind = pop['B_3']
+    ind.infected = 1.5
+    assert pop.infected[ind.row] == 1.5
+    assert ind.infected == 1.5 and isinstance(ind.infected, float)
+    assert ind.recovered is False
+    ind.quarantined = 5.0
+    assert ind.quarantined == 5.0
+
+    # states are kept by removed individuals, and rows are not reused
+    pop.remove('B_3')
+    assert ind.infected == 1.5 and ind.quarantined == 5.0
+    assert pop.ids_of(pop.members('B'))[:3] == ['B_0', 'B_1', 'B_2']
+    assert len(pop.members()) == 29
+    ind.id = 'B_20'
+    pop.add([ind], 'B')
+    assert ind.row == 30 and pop.infected[30] == 1.5
+    assert pop.counter('n_infected') == 1
+
+    new_id = pop.move('A_0', 'B')
+    assert new_id in pop.ids_of(pop.members('B'))
+    assert len(pop.members('A')) == 9
+
+
+def test_lazy_individuals(population_factory):
+    pop = population_factory(popsize=['A=10', 'B=20'])
+    assert pop.by_row[:30] == [None] * 30
+    # states of individuals in default state are changed without
+    # creating the individuals
+    pop.set_field(3, 'infected', 1.0)
+    pop.set_field(4, 'quarantined', 2.0)
+    assert pop.count('infected') == 1 and 4 not in pop.eligible
+    assert pop.by_row[:30] == [None] * 30
+    assert pop.susceptibility(12) == pop['B_2'].susceptibility
+    # individuals are created when they are accessed
+    assert pop['A_3'] is pop.by_row[3] and pop['A_3'].infected == 1.0
+    assert sum(x is not None for x in pop.by_row) == 2
+    assert pop.row(pop.select()) is not None
+
+
+def test_compact(population_factory):
+    pop = population_factory(popsize=['A=10', 'B=20'])
+    pop.model.draw_prop_asym_carriers()
+    for ID in ('A_1', 'A_2', 'B_3', 'B_4'):
+        pop[ID]
+    pop['B_5'].susceptibility = 0.5
+    pop['A_1'].infect(0, by=None)
+    pop['A_2'].infect(0, by=None)
+    pop['A_2'].recovered = 10.0
+    # only compacted if there are enough Individual objects
+    pop.compact(100)
+    assert sum(x is not None for x in pop.by_row) == 5
+    # individuals in default state are dropped, and recovered individuals
+    # after they no longer have viral load
+    cleared = pop['A_2'].clearance_time()
+    pop.compact(cleared - 1, min_size=0)
+    assert [pop.id(x) for x in pop.materialized] == ['A_1', 'A_2', 'B_5']
+    assert pop['A_2'].viral_load(cleared) == 0
+    # and again after the number of Individual objects doubles
+    for ID in ('B_6', 'B_7'):
+        pop[ID]
+    pop.compact(cleared, min_size=0)
+    assert len(pop.materialized) == 5
+    pop['B_8']
+    pop.compact(cleared, min_size=0)
+    assert [pop.id(x) for x in pop.materialized] == ['A_1', 'B_5']
+    assert pop['A_2'].infected == 0.0 and pop['A_2'].recovered == 10.0
+    assert pop['A_2'].test_sensitivity(cleared, 0) == 0
+    assert pop['A_2'].infect(cleared, by=None) == []
+
+
+def test_ids(population_factory):
+    pop = population_factory(popsize=['A=10', 'B=20'])
+    # IDs are translated to rows and formatted from rows
+    assert pop.row('B_3') == 13
+    assert pop.id(13) == 'B_3'
+    assert pop['B_3'] is pop[13]
+    assert pop[13].group == 'B'
+    assert pop.row('B_30') is None and pop.row('C_1') is None and pop.row('B_03') is None
+    assert 'B_30' not in pop and 30 not in pop
+
+    # moved individuals keep their rows under new IDs
+    assert pop.move('A_1', 'B') == 'B_20'
+    assert 'A_1' not in pop
+    assert pop.row('B_20') == 1 and pop[1].group == 'B'
+
+    pop.remove('B_3')
+    assert 13 not in pop and pop.id(13) == 'B_3'
+    with pytest.raises(KeyError):
+        pop['B_3']
+
+
+def test_members(population_factory):
+    pop = population_factory(popsize=['A=10', 'B=20'])
+    assert list(pop.members('A')) == list(range(10))
+    assert len(pop.members()) == 30
+
+    pop.remove('A_2')
+    new_id = pop.move('A_5', 'B')
+    pop.add([Individual(None, 1, pop['A_0'].model, pop['A_0'].logger)], 'A')
+    assert list(pop.members('A')) == [0, 1, 3, 4, 6, 7, 8, 9, 30]
+    assert list(pop.members('B'))[-1] == pop.row(new_id) == 5
+    assert pop.ids_of(pop.members('A'))[-1] == 'A_10'
+    assert sorted(pop.members()) == sorted(list(pop.members('A')) + list(pop.members('B')))
+
+
+def test_group_counts(population_factory):
+    pop = population_factory(popsize=['A=10', 'B=20'])
+    pop['A_1'].infected = 0.0
+    pop['A_2'].infected = 1.5
+    pop['A_2'].recovered = 10.0
+    pop['B_3'].infected = 2.0
+    pop['B_4'].quarantine(till=5)
+    assert [pop.count(x, 'A') for x in ('susceptible', 'infected', 'active', 'recovered')] == [8, 2, 1, 1]
+    assert pop.count('quarantined', 'B') == 1
+    assert pop.count('susceptible') == 27
+
+    pop.move('A_1', 'B')
+    pop.remove('B_3')
+    pop['B_4'].reintegrate()
+    assert [pop.count(x, 'A') for x in ('infected', 'active', 'removed', 'popsize')] == [1, 0, 0, 9]
+    assert [pop.count(x, 'B') for x in ('infected', 'active', 'removed', 'quarantined')] == [1, 1, 1, 0]
+    assert pop.counter('n_removed') == 1
+    with pytest.raises(ValueError):
+        pop.count('unknown')
+
+
+def test_release(population_factory):
+    pop = population_factory(popsize=['A=10', 'B=20'])
+    for i in range(5):
+        pop[f'A_{i}'].quarantine(till=2.0)
+    pop['A_0'].quarantine(till=4.0)
+    pop.remove('A_1')
+    assert pop.next_release() == 2.0
+    assert pop.pending_releases() == 4
+    assert len(pop.group_eligible['A']) == 5
+
+    # quarantines are lifted in bulk, skipping removed and quarantined again
+    pop.release(3.0)
+    assert [pop[f'A_{i}'].quarantined for i in (0, 2, 3, 4)] == [4.0, False, False, False]
+    assert len(pop.group_eligible['A']) == 8
+    assert pop.count('quarantined') == 1
+    assert pop.next_release() == 4.0
+
+
+def test_eligible(population_factory):
+    pop = population_factory(popsize=['A=10', 'B=20'])
+    assert len(pop.eligible) == 30
+    assert len(pop.group_eligible['A']) == 10
+
+    pop['A_1'].quarantine(till=5)
+    pop.remove('B_12')
+    new_id = pop.move('A_2', 'B')
+    assert len(pop.eligible) == 28
+    assert len(pop.group_eligible['A']) == 8
+    assert len(pop.group_eligible['B']) == 20
+    for items in (pop.eligible, pop.group_eligible['B']):
+        assert all(items.pos[x] == i for i, x in enumerate(items))
+    assert pop.row(new_id) in pop.group_eligible['B']
+
+    pop['A_1'].reintegrate()
+    assert len(pop.group_eligible['A']) == 9
+
+    # the infector and quarantined individuals are not selected
+    for i in (0, 1, 4, 5, 6, 7, 8, 9):
+        pop[f'A_{i}'].quarantine(till=5)
+    pop.vicinity = pop.parse_vicinity(['A-A=10', 'A-B=0'])
+    assert pop.select(infector='A_3') is None
+    pop['A_4'].reintegrate()
+    assert all(pop.id(pop.select(infector='A_3')) == 'A_4' for i in range(10))
+
+
+def test_mixing_table(population_factory):
+    pop = population_factory(popsize=['A=10', 'B=20', 'C=30'], vicinity=['A-A=0', 'A-B=10'])
+    groups, table = pop.mixing_table('A')
+    assert groups == ['A', 'B', 'C']
+    assert table.prob[0] == 0
+    # tables are reused until the size of groups changes
+    assert pop.mixing_table('A')[1] is table
+    pop.remove('C_10')
+    assert pop.mixing_table('A')[1] is not table
+    assert all(pop.id(pop.select(infector='A_1')).startswith(('B', 'C')) for i in range(100))
+
+
 def test_select(population_factory):
     # no vicinity
     pop = population_factory(popsize=['A=100', 'B=300'])
     cnt = {'A': 0, 'B': 0}
     for i in range(1000):
         selected = pop.select(infector='B_10')
-        cnt[pop.individuals[selected].group] += 1
+        cnt[pop[selected].group] += 1
 
     assert cnt['A'] / (cnt['A'] + cnt['B']) > 0.15 and cnt['A'] / (cnt['A'] + cnt['B']) < 0.35
     assert cnt['B'] / (cnt['A'] + cnt['B']) > 0.60 and cnt['B'] / (cnt['A'] + cnt['B']) < 0.90
@@ -47,7 +258,7 @@ def test_select(population_factory):
     cnt = {'A': 0, 'B': 0}
     for i in range(1000):
         selected = pop.select(infector='A_10')
-        cnt[pop.individuals[selected].group] += 1
+        cnt[pop[selected].group] += 1
 
     assert cnt['A'] / (cnt['A'] + cnt['B']) > 0.15 and cnt['A'] / (cnt['A'] + cnt['B']) < 0.35
     assert cnt['B'] / (cnt['A'] + cnt['B']) > 0.60 and cnt['B'] / (cnt['A'] + cnt['B']) < 0.90
@@ -57,7 +268,7 @@ def test_select(population_factory):
 
     for i in range(10):
         selected = pop.select(infector='A_0')
-        assert not selected.startswith('A')
+        assert not pop.id(selected).startswith('A')
 
     #
     pop = population_factory(popsize=['A=100', 'B=200'], vicinity=['A-A=50', 'A-B=10'])
@@ -65,7 +276,7 @@ def test_select(population_factory):
     cnt = {'A': 0, 'B': 0}
     for i in range(1000):
         selected = pop.select(infector='A_0')
-        cnt[pop.individuals[selected].group] += 1
+        cnt[pop[selected].group] += 1
 
     assert cnt['A'] / (cnt['A'] + cnt['B']) > 0.5 and cnt['A'] / (cnt['A'] + cnt['B']) < 0.95
     assert cnt['B'] / (cnt['A'] + cnt['B']) < 0.5 and cnt['B'] / (cnt['A'] + cnt['B']) > 0.05
@@ -74,7 +285,7 @@ def test_select(population_factory):
     cnt = {'A': 0, 'B': 0}
     for i in range(1000):
         selected = pop.select(infector='B_10')
-        cnt[pop.individuals[selected].group] += 1
+        cnt[pop[selected].group] += 1
 
     assert cnt['A'] / (cnt['A'] + cnt['B']) > 0.15 and cnt['A'] / (cnt['A'] + cnt['B']) < 0.35
     assert cnt['B'] / (cnt['A'] + cnt['B']) > 0.60 and cnt['B'] / (cnt['A'] + cnt['B']) < 0.90
@@ -84,7 +295,7 @@ def test_select(population_factory):
 
     for i in range(10):
         selected = pop.select()
-        assert not selected.startswith('A')
+        assert not pop.id(selected).startswith('A')
 
     #
     # ! match
@@ -93,7 +304,7 @@ def test_select(population_factory):
     cnt = {'A': 0, 'B': 0}
     for i in range(1000):
         selected = pop.select(infector=None)
-        cnt[pop.individuals[selected].group] += 1
+        cnt[pop[selected].group] += 1
 
     assert cnt['A'] / (cnt['A'] + cnt['B']) > 0.5 and cnt['A'] / (cnt['A'] + cnt['B']) < 0.95
     assert cnt['B'] / (cnt['A'] + cnt['B']) < 0.5 and cnt['B'] / (cnt['A'] + cnt['B']) > 0.05
@@ -104,7 +315,24 @@ def test_select(population_factory):
     cnt = {'A': 0, 'B': 0}
     for i in range(1000):
         selected = pop.select(infector='A_10')
-        cnt[pop.individuals[selected].group] += 1
+        cnt[pop[selected].group] += 1
 
     assert cnt['A'] / (cnt['A'] + cnt['B']) > 0.4 and cnt['A'] / (cnt['A'] + cnt['B']) < 0.6
     assert cnt['B'] / (cnt['A'] + cnt['B']) > 0.4 and cnt['B'] / (cnt['A'] + cnt['B']) < 0.6
+
+
+def test_remove_cancel_events(population_factory, logger):
+    from covid19_outbreak_simulator.event import Event, EventType
+    from covid19_outbreak_simulator.scheduler import HeapEventQueue
+
+    pop = population_factory(popsize=['100'])
+    pop.event_queue = HeapEventQueue()
+    # events refer to individuals by their rows in the population
+    pop.event_queue.extend(pop.resolve([
+        Event(1.0, EventType.INFECTION, target=None, logger=logger, by='6'),
+        Event(2.0, EventType.RECOVER, target='6', logger=logger),
+        Event(2.0, EventType.RECOVER, target='7', logger=logger)]))
+
+    pop.remove('6')
+    assert len(pop.event_queue) == 1
+    assert [pop.id(x.target) for x in pop.event_queue] == ['7']
@@ -0,0 +1,121 @@
+import pickle
+
+import pytest
+
+from covid19_outbreak_simulator.event import Event, EventType, InfectionSchedule
+from covid19_outbreak_simulator.scheduler import (CalendarEventQueue,
+                                                  DictEventQueue,
+                                                  HeapEventQueue,
+                                                  create_event_queue)
+
+
+@pytest.mark.parametrize('queue_type', ['heap', 'calendar', 'legacy'])
+def test_event_queue_order(queue_type, logger):
+    events = create_event_queue(queue_type, interval=0.5)
+    assert not events
+    assert events.next_time() == 0.0
+
+    for idx, time in enumerate([2.0, 1.0, 2.0, 0.5, 1.0, 2.0]):
+        events.push(Event(time, EventType.RECOVER, target=str(idx), logger=logger))
+    assert len(events) == 6
+
+    assert events.next_time() == 0.5
+    assert [x.target for x in events.pop(0.5)] == ['3']
+    assert events.next_time() == 1.0
+    assert [x.target for x in events.pop(1.0)] == ['1', '4']
+    # events pushed during processing are returned after existing ones
+    events.push(Event(2.0, EventType.RECOVER, target='6', logger=logger))
+    assert [x.target for x in events.pop(2.0)] == ['0', '2', '5', '6']
+    assert not events
+    assert events.pop(3.0) == []
+
+
+def test_calendar_event_queue(population_factory, logger):
+    events = CalendarEventQueue(interval=1 / 24)
+    # times that differ only by rounding errors are grouped together
+    events.push(Event(1 / 24 * 5, EventType.RECOVER, target='0', logger=logger))
+    events.push(Event(5 / 24 + 1e-9, EventType.RECOVER, target='1', logger=logger))
+    events.push(Event(100.0, EventType.RECOVER, target='2', logger=logger))
+    events.push(Event(0.01, EventType.RECOVER, target='3', logger=logger))
+    assert events.snap(5 / 24 + 1e-9) == events.snap(1 / 24 * 5)
+
+    assert events.next_time() == 0
+    assert [x.target for x in events.pop(0)] == ['3']
+    time = events.next_time()
+    assert [x.target for x in events.pop(time)] == ['0', '1']
+    assert events.next_time() == pytest.approx(100.0)
+    assert [x.target for x in events.pop(events.next_time())] == ['2']
+    assert not events
+
+    # quarantines after symptoms last for the specified duration from
+    # the rounded time at which they start
+    pop = population_factory(popsize=['100'])
+    pop.event_queue = events
+    evts = pop['0'].symptomatic_infect(0.01, by=None, handle_symptomatic=['quarantine_7'])
+    events.extend(evts)
+    quarantine = [x for x in evts if x.action == EventType.QUARANTINE][0]
+    assert quarantine.time == events.snap(quarantine.time)
+    assert quarantine.kwargs['till'] - quarantine.time == pytest.approx(7)
+
+
+def test_create_event_queue():
+    assert isinstance(create_event_queue('heap'), HeapEventQueue)
+    assert isinstance(create_event_queue('calendar', interval=1), CalendarEventQueue)
+    assert isinstance(create_event_queue('legacy'), DictEventQueue)
+    with pytest.raises(ValueError):
+        create_event_queue('unknown')
+
+
+@pytest.mark.parametrize('queue_type', ['heap', 'calendar'])
+def test_cancel_events(queue_type, logger):
+    events = create_event_queue(queue_type, interval=0.5)
+    events.push(Event(1.0, EventType.INFECTION, target=None, logger=logger, by='1'))
+    events.push(Event(3.0, EventType.INFECTION, target=None, logger=logger, by='1'))
+    events.push(Event(4.0, EventType.RECOVER, target='1', logger=logger))
+    events.push(Event(2.0, EventType.INFECTION, target=None, logger=logger, by='2'))
+    events.push(Event(5.0, EventType.RECOVER, target='2', logger=logger))
+
+    counts, n_infectors = events.summarize(None)
+    assert counts == {'INFECTION': 3, 'RECOVER': 2}
+    assert n_infectors == 2
+
+    # all events of removed individual
+    cancelled = events.cancel('1')
+    assert sorted(x.time for x in cancelled) == [1.0, 3.0, 4.0]
+    assert events.cancel('1') == []
+
+    counts, n_infectors = events.summarize(None)
+    assert counts == {'INFECTION': 1, 'RECOVER': 1}
+    assert n_infectors == 1
+
+    assert events.next_time() == 2.0
+    assert [x.kwargs['by'] for x in events.pop(2.0)] == ['2']
+    assert events.next_time() == 5.0
+    assert len(events) == 1
+
+
+@pytest.mark.parametrize('queue_type', ['heap', 'calendar', 'legacy'])
+def test_summarize_infection_schedule(queue_type, logger):
+    events = create_event_queue(queue_type, interval=0.5)
+    kwargs = {'by': '1', 'handle_symptomatic': None}
+    kwargs['schedule'] = InfectionSchedule([1.0, 2.0, 3.0], logger, kwargs)
+    events.push(kwargs['schedule'].next_event())
+
+    counts, n_infectors = events.summarize(['1'])
+    assert counts == {'INFECTION': 3}
+    assert n_infectors == 1
+
+
+@pytest.mark.parametrize('queue_type', ['heap', 'calendar', 'legacy'])
+def test_remove_and_pickle(queue_type):
+    events = create_event_queue(queue_type, interval=0.5)
+    events.push(Event(1.0, EventType.RECOVER, target='1'))
+    events.push(Event(1.0, EventType.REMOVAL, target='2'))
+    events.push(Event(2.0, EventType.RECOVER, target='3'))
+    events.remove(lambda x: x.action == EventType.REMOVAL)
+    assert len(events) == 2
+
+    events = pickle.loads(pickle.dumps(events))
+    events.push(Event(1.0, EventType.SHOW_SYMPTOM, target='4'))
+    assert [x.target for x in events.pop(events.next_time())] == ['1', '4']
+    assert [x.target for x in events.pop(events.next_time())] == ['3']
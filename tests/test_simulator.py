@@ -1,7 +1,14 @@
 import os
+import random
+from io import StringIO
+
+import numpy as np
 import pytest
 from covid19_outbreak_simulator.cli import parse_args, main
 from covid19_outbreak_simulator.model import Params
+from covid19_outbreak_simulator.simulator import (Simulator, StopCondition,
+                                                  parse_stop_if,
+                                                  population_templates)
 
 
 def test_option_popsize():
@@ -388,6 +395,40 @@ def test_main_stop_if():
 def test_main_stop_if_error():
     with pytest.raises(Exception):
         main(["--jobs", "1", "--repeats", "100", "--stop-if", "st>1"])
+    with pytest.raises(Exception):
+        main(["--jobs", "1", "--repeats", "100", "--stop-if", "t<1"])
+    with pytest.raises(Exception):
+        main(["--jobs", "1", "--repeats", "100", "--stop-if", "n_infected>a"])
+
+
+def test_stop_condition():
+    cond = StopCondition('n_infected > 200')
+    assert str(cond) == 'n_infected>200'
+    assert cond(201) and not cond(200)
+    assert StopCondition('n_active==0')(0)
+    assert StopCondition('t>=30')(30)
+
+    time_conditions, stop_conditions = parse_stop_if(['t>30', 'popsize<50'])
+    assert [str(x) for x in time_conditions] == ['t>30']
+    assert [str(x) for x in stop_conditions] == ['popsize<50']
+    assert parse_stop_if(None) == ([], [])
+
+
+def test_main_stop_if_counters():
+    main(["--jobs", "1", "--repeats", "20", "--popsize", "1000", "--infectors", "0",
+        "--symptomatic-r0", "4", "--asymptomatic-r0", "4", "--handle-symptomatic", "keep",
+        "--stop-if", "n_infected>10", "t>30", "--logfile", "test.out"])
+    with open("test.out") as log:
+        lines = log.readlines()
+    ends = [x for x in lines if '\tEND\t' in x]
+    assert len(ends) == 20
+    for end in ends:
+        if 'stopped_by=n_infected>10' in end:
+            id = end.split('\t')[0]
+            assert sum(x.startswith(f'{id}\t') and '\tINFECTION\t' in x for x in lines) > 10
+    assert any('stopped_by=n_infected>10' in x for x in ends)
+    main(["--jobs", "1", "--repeats", "20", "--stop-if", "popsize<60",
+        "--plugin", "stat", "--interval", "1"])
 
 
 def test_symptomatic_transmissibility_model(clear_log):
@@ -474,3 +515,168 @@ def test_asymptomatic_transmissibility_model(clear_log):
             "1.147",
         ]
     )
+
+
+def test_main_event_queue():
+    main(["--jobs", "1", "--repeats", "20", "--event-queue", "heap"])
+    main(["--jobs", "1", "--repeats", "20", "--event-queue", "calendar"])
+    main(["--jobs", "1", "--repeats", "20", "--event-queue", "legacy"])
+    with pytest.raises(SystemExit):
+        main(["--jobs", "1", "--repeats", "20", "--event-queue", "unknown"])
+
+
+def test_shortened_quarantine():
+    # infections after the end of a quarantine that is shortened by
+    # another quarantine happen with all event queues
+    counts = {}
+    for queue in ('heap', 'calendar', 'legacy'):
+        counts[queue] = []
+        for seed in range(10):
+            args = parse_args(["--popsize", "500", "--infectors", "0",
+                "--handle-symptomatic", "keep", "--event-queue", queue,
+                "--plugin", "quarantine", "0", "--at", "1", "--duration", "20",
+                "--plugin", "quarantine", "0", "--at", "1.5", "--duration", "0.5"])
+            np.random.seed(seed)
+            random.seed(seed)
+            logger = StringIO()
+            logger.id = 1
+            Simulator(params=Params(args), logger=logger, simu_args=args, cmd=[]).simulate(1)
+            counts[queue].append(sum('\tINFECTION\t' in x and 'by=0,' in x
+                for x in logger.getvalue().splitlines()))
+    assert counts['heap'] == counts['legacy']
+    assert counts['calendar'] == counts['legacy']
+    assert sum(counts['legacy']) > 0
+
+
+def test_main_lazy_schedule():
+    main(["--jobs", "1", "--repeats", "20", "--lazy-schedule"])
+    main(["--jobs", "1", "--repeats", "20", "--lazy-schedule", "--handle-symptomatic", "quarantine_7"])
+    main(["--jobs", "1", "--repeats", "20", "--lazy-schedule", "--event-queue", "legacy"])
+
+
+def test_main_batch_size():
+    main(["--jobs", "2", "--repeats", "25", "--batch-size", "10", "--logfile", "test.out"])
+    with open("test.out") as log:
+        ends = [x.split('\t')[0] for x in log if '\tEND\t' in x]
+    assert sorted(int(x) for x in ends) == list(range(1, 26))
+
+
+def test_batch_error(monkeypatch):
+    import queue
+    from covid19_outbreak_simulator import cli
+
+    class FailingSimulator(object):
+        def __init__(self, params, logger, simu_args, cmd):
+            self.logger = logger
+
+        def simulate(self, id):
+            if id == 2:
+                raise ValueError('failed')
+            self.logger.write(f'{id}\t1.00\tEND\t100\t.\n')
+
+    monkeypatch.setattr(cli, 'Simulator', FailingSimulator)
+    tasks = queue.Queue()
+    results = queue.Queue()
+    tasks.put([1, 2, 3])
+    with pytest.raises(ValueError):
+        cli.Worker(tasks, results, parse_args([]), []).run()
+    # only replicates that have not finished are marked as errors
+    logs = [results.get() for i in range(3)]
+    assert '\tERROR\t' not in logs[0] and '\tEND\t' in logs[0]
+    assert '\tERROR\t' in logs[1] and '\tERROR\t' in logs[2]
+
+
+def test_main_infection_sampler():
+    for sampler in ('bernoulli', 'thinning', 'poisson', 'continuous'):
+        main(["--jobs", "1", "--repeats", "20", "--infection-sampler", sampler,
+            "--handle-symptomatic", "quarantine_7", "--plugin", "init",
+            "--incidence-rate", "0.05", "--leadtime", "any"])
+    with pytest.raises(SystemExit):
+        main(["--jobs", "1", "--repeats", "20", "--infection-sampler", "unknown"])
+
+
+def test_kernel_tolerance():
+    main(["--jobs", "1", "--repeats", "20", "--kernel-tolerance", "0.05"])
+    args = parse_args(["--popsize", "500", "--infectors", "0", "1", "2",
+        "--kernel-tolerance", "0.05", "--verify-kernels"])
+    logger = StringIO()
+    Simulator(params=Params(args), logger=logger, simu_args=args, cmd=[]).simulate(1)
+    end = logger.getvalue().splitlines()[-1]
+    assert float(end.rsplit('kernel_error=', 1)[1]) < 0.01
+
+
+def test_main_snapshot_fork(tmp_path):
+    args = ["--jobs", "1", "--repeats", "10", "--infectors", "0",
+        "--symptomatic-r0", "3", "--asymptomatic-r0", "3"]
+    plugins = ["--plugin", "stat", "--interval", "1"]
+
+    def read_log(filename):
+        # events of each replicate, without START and END
+        with open(filename) as log:
+            return sorted(x for x in log if x[0].isdigit() and
+                '\tSTART\t' not in x and '\tEND\t' not in x)
+
+    main(args + ["--snapshot-at", "5", "--snapshot-dir", str(tmp_path),
+        "--logfile", str(tmp_path / "original.log")] + plugins)
+    assert sorted(os.listdir(tmp_path))[:2] == ["1.pickle", "10.pickle"]
+    # replicates forked with the same plugins continue exactly as the original
+    main(args + ["--fork-from", str(tmp_path), "--logfile", str(tmp_path / "fork.log")] + plugins)
+    assert read_log(tmp_path / "original.log") == read_log(tmp_path / "fork.log")
+    # and share the history before the snapshot with different plugins
+    main(args + ["--fork-from", str(tmp_path), "--logfile", str(tmp_path / "branch.log"),
+        "--plugin", "quarantine", "--at", "5", "--target", "all"])
+    assert [x for x in read_log(tmp_path / "original.log")
+        if float(x.split('\t')[1]) < 5] == [
+        x for x in read_log(tmp_path / "branch.log") if float(x.split('\t')[1]) < 5]
+
+    with pytest.raises(Exception):
+        main(args + ["--fork-from", str(tmp_path / "nonexisting")])
+
+
+def test_main_checkpoint(tmp_path):
+    args = ["--jobs", "1", "--repeats", "1", "--popsize", "500", "--infectors", "0",
+        "--symptomatic-r0", "3", "--asymptomatic-r0", "3", "--checkpoint-dir", str(tmp_path),
+        "--checkpoint-interval", "2", "--logfile", str(tmp_path / "resumed.log")]
+    # a replicate that is interrupted after its first checkpoint
+    params = parse_args(args)
+    logger = StringIO()
+    simu = Simulator(params=Params(params), logger=logger, simu_args=params, cmd=[])
+    save_state = simu.save_state
+
+    def interrupt(*args, **kwargs):
+        save_state(*args, **kwargs)
+        raise KeyboardInterrupt()
+
+    simu.save_state = interrupt
+    with pytest.raises(KeyboardInterrupt):
+        simu.simulate(1)
+    assert os.listdir(tmp_path) == ["1.pickle"]
+
+    # is continued from the checkpoint, which is removed afterwards
+    main(args + ["--resume"])
+    assert not os.path.isfile(tmp_path / "1.pickle")
+    with open(tmp_path / "resumed.log") as log:
+        lines = log.read()
+    assert lines.startswith("id\ttime") and logger.getvalue() in lines
+    assert "\tEND\t" in lines
+
+
+def test_population_template():
+    args = parse_args(["--popsize", "A=100", "B=200", "--infectors", "A_0",
+        "--vicinity", "A-A=0", "--stop-if", "t>10",
+        "--plugin", "quarantine", "--at", "2", "--proportion", "0.5"])
+    population_templates.clear()
+    logs = []
+    for i in range(2):
+        np.random.seed(1)
+        random.seed(1)
+        logger = StringIO()
+        Simulator(params=Params(args), logger=logger, simu_args=args, cmd=[]).simulate(1)
+        logs.append([x.split('\t', 3)[2:] for x in logger.getvalue().splitlines()[1:]])
+    # the second replicate is cloned from the population of the first one,
+    # which is not changed by the simulation
+    assert len(population_templates) == 1
+    assert logs[0] == logs[1]
+    template = next(iter(population_templates.values()))
+    assert template.count('infected') == 0 and template.count('quarantined') == 0
+    assert len(template.eligible) == 300
@@ -0,0 +1,198 @@
+from argparse import Namespace
+from io import StringIO
+
+import numpy as np
+import pytest
+
+from covid19_outbreak_simulator.cli import main, parse_args
+from covid19_outbreak_simulator.model import Params
+from covid19_outbreak_simulator.vectorized import (VectorizedPopulation,
+                                                   VectorizedSimulator,
+                                                   parse_handle_symptomatic)
+
+
+def test_parse_handle_symptomatic():
+    assert parse_handle_symptomatic(None) == (1, 0, 1)
+    assert parse_handle_symptomatic(['keep', '0.5']) == (0, 0, 0.5)
+    assert parse_handle_symptomatic(['quarantine']) == (2, 14, 1)
+    assert parse_handle_symptomatic(['quarantine_7', '0.2']) == (2, 7, 0.2)
+    with pytest.raises(ValueError):
+        parse_handle_symptomatic(['unknown'])
+    with pytest.raises(ValueError):
+        parse_handle_symptomatic(['remove', '2'])
+
+
+def test_vectorized_population(default_model, logger):
+    default_model.draw_prop_asym_carriers()
+    pop = VectorizedPopulation(popsize=['A=10', 'B=20'], models=[default_model],
+        vicinity=['A-A=0'], loggers=[logger])
+    assert pop.popsize(0) == 30
+    assert pop.index('B_0') == 10
+    assert pop.id(10) == 'B_0'
+    with pytest.raises(ValueError):
+        pop.index('B_20')
+    with pytest.raises(ValueError):
+        pop.index('C_0')
+
+    # infectors from group A only infect group B
+    infectees = pop.select(np.array([0] * 100 + [10] * 100), 0)
+    assert all(infectees[:100] >= 10)
+    assert 10 not in infectees[100:]
+
+    # quarantined and removed individuals are not infected
+    pop.quarantine(range(10), 0, 2)
+    pop.remove(29)
+    infectees = pop.select(np.array([-1] * 100), 0)
+    assert all((infectees >= 10) & (infectees < 29))
+
+    assert pop.infect([10, 10], 0) == [10]
+    assert pop.n_infected[0] == 1
+    assert list(pop.active) == [10]
+    pop.update(1000)
+    assert not len(pop.active)
+    assert not pop.present[10] or pop.recovered[10] == 1000
+
+
+def test_vectorized_kernel_buffer(default_model, logger):
+    default_model.draw_prop_asym_carriers()
+    pop = VectorizedPopulation(popsize=['1000'], models=[default_model],
+        vicinity=None, loggers=[logger], handle_symptomatic=['keep'])
+
+    def kernel(idx):
+        return pop._kernels[pop.kernel_start[idx]:pop.kernel_start[idx] + pop.kernel_stop[idx]].copy()
+
+    # the buffer is compacted and extended while individuals are infected,
+    # and keeps the steps of infections that are logged as r
+    pop.infect(range(100), 0)
+    logger.flush()
+    with open(logger.name) as log:
+        r = {x.split('\t')[3]: int(x.split(',r=')[1].split(',')[0])
+            for x in log if '\tINFECTION\t' in x}
+    assert all(set(kernel(x)) <= {0, 1} for x in range(100))
+    assert all(kernel(x).sum() == r[pop.id(x)] for x in range(100))
+    # kernels of recovered individuals are discarded
+    pop.update(1000)
+    pop.infect(range(100, 300), 1000)
+    kernels = {x: kernel(x) for x in range(100, 300)}
+    pop.infect(range(300, 400), 1000)
+    assert pop._kernel_size < pop.kernel_stop.sum()
+    assert all(np.array_equal(kernel(x), y) for x, y in kernels.items())
+
+
+def test_vectorized_replicates(default_model):
+    default_model.draw_prop_asym_carriers()
+    loggers = [StringIO() for i in range(3)]
+    for i, logger in enumerate(loggers):
+        logger.id = i + 1
+    pop = VectorizedPopulation(popsize=['A=10', 'B=20'],
+        models=[default_model] * 3, vicinity=['A-A=0'], loggers=loggers)
+    assert pop.index('B_0', 2) == 70
+    assert pop.id(70) == 'B_0'
+
+    # infectees are selected from the replicates of infectors
+    infectees = pop.select(np.array([0] * 100 + [30] * 100), 0)
+    assert all((infectees[:100] >= 10) & (infectees[:100] < 30))
+    assert all((infectees[100:] >= 40) & (infectees[100:] < 60))
+    infectees = pop.select(np.array([-1] * 100), 0, replicates=np.array([2] * 100))
+    assert all(infectees >= 60)
+
+    pop.remove(70)
+    assert [pop.popsize(x) for x in range(3)] == [30, 30, 29]
+    assert pop.infect([40], 0) == [40]
+    assert list(pop.n_infected) == [0, 1, 0]
+    assert 'INFECTION\tB_0' in loggers[1].getvalue()
+    assert not loggers[0].getvalue()
+    assert list(pop.idle()) == [True, False, True]
+
+    pop.stop(1)
+    assert not len(pop.active)
+    assert len(pop.members()) == 59
+    assert [x[0] for x in pop.split(pop.members())] == [0, 2]
+
+
+def test_vectorized_simulator(logger):
+    args = parse_args(['--popsize', 'A=100', 'B=200', '--stop-if', 't>10',
+        '--engine', 'vectorized', '--plugin', 'init', '--incidence-rate', '0.1',
+        '--plugin', 'stat', '--interval', '1'])
+    VectorizedSimulator(params=Params(args), logger=logger, simu_args=args,
+        cmd=[]).simulate(1)
+
+    args = parse_args(['--engine', 'vectorized', '--plugin', 'insert', 'A=10'])
+    with pytest.raises(ValueError):
+        VectorizedSimulator(params=Params(args), logger=logger, simu_args=args,
+            cmd=[]).simulate(1)
+
+
+def test_vectorized_simulate_batch():
+    loggers = [StringIO() for i in range(5)]
+    for i, logger in enumerate(loggers):
+        logger.id = i + 1
+    args = parse_args(['--popsize', 'A=100', 'B=200', '--stop-if', 't>10',
+        '--engine', 'vectorized', '--plugin', 'init', '--incidence-rate', '0.1',
+        '--plugin', 'stat', '--interval', '1'])
+    VectorizedSimulator(params=Params(args), logger=loggers[0], simu_args=args,
+        cmd=[]).simulate_batch(loggers)
+    # each replicate is logged with its own ID and ends at the stop time
+    for i, logger in enumerate(loggers):
+        lines = logger.getvalue().splitlines()
+        assert all(x.startswith(f'{i + 1}\t') for x in lines)
+        assert lines[0].split('\t')[2] == 'START'
+        assert lines[-1].split('\t')[:3] == [str(i + 1), '10.00', 'END']
+        assert sum('name=init' in x for x in lines) == 1
+        assert sum('\tSTAT\t' in x for x in lines) == 11
+
+
+def test_vectorized_stop_if():
+    loggers = [StringIO() for i in range(5)]
+    for i, logger in enumerate(loggers):
+        logger.id = i + 1
+    args = parse_args(['--popsize', '1000', '--stop-if', 'n_infected>20', 't>60',
+        '--engine', 'vectorized', '--plugin', 'init', '--incidence-rate', '0.01',
+        '--plugin', 'stat', '--interval', '1'])
+    VectorizedSimulator(params=Params(args), logger=loggers[0], simu_args=args,
+        cmd=[]).simulate_batch(loggers)
+    for logger in loggers:
+        lines = logger.getvalue().splitlines()
+        assert lines[-1].split('\t')[2] == 'END'
+        if 'stopped_by=n_infected>20' in lines[-1]:
+            assert sum('\tINFECTION\t' in x for x in lines) > 20
+        else:
+            assert 'stopped_by=t>60' in lines[-1] or 'stopped_by' not in lines[-1]
+
+
+def test_vectorized_report(tmp_path):
+    from covid19_outbreak_simulator.report import summarize_simulations
+
+    main(["--jobs", "1", "--repeats", "20", "--engine", "vectorized",
+        "--popsize", "1000", "--stop-if", "t>10", "--handle-symptomatic", "keep",
+        "--logfile", str(tmp_path / "vectorized.log"),
+        "--plugin", "init", "--incidence-rate", "0.01", "--leadtime", "any"])
+    summarize_simulations(str(tmp_path / "vectorized.log"), str(tmp_path / "report.txt"))
+    with open(tmp_path / "report.txt") as report:
+        totals = dict(x.rstrip('\n').split('\t', 1) for x in report)
+    # infections by infectors in each phase are reported
+    assert int(totals['total_asym_infection']) > 0
+    assert int(totals['total_presym_infection']) > 0
+    assert int(totals['total_sym_infection']) > 0
+    with open(tmp_path / "vectorized.log") as log:
+        ends = [x for x in log if '\tEND\t' in x]
+    assert len(ends) == 20
+    # and pending events of replicates that are stopped
+    assert any('remaining_events=' in x and 'RECOVER:' in x for x in ends)
+
+
+def test_main_vectorized():
+    main(["--jobs", "1", "--repeats", "20", "--engine", "vectorized"])
+    main(["--jobs", "1", "--repeats", "20", "--engine", "vectorized",
+        "--popsize", "A=100", "B=200", "--vicinity", "A-A=0", "--susceptibility", "A=0.8",
+        "--handle-symptomatic", "quarantine_7", "--infectors", "A_0", "--stop-if", "t>20",
+        "--plugin", "community_infection", "--probability", "0.001", "--interval", "1",
+        "--plugin", "quarantine", "--at", "5", "--proportion", "0.5",
+        "--plugin", "stat", "--interval", "5"])
+    main(["--jobs", "1", "--repeats", "20", "--engine", "vectorized",
+        "--plugin", "init", "--incidence-rate", "0.05", "--seroprevalence", "0.1",
+        "--leadtime", "any", "--as-proportion"])
+    main(["--jobs", "2", "--repeats", "25", "--batch-size", "10", "--engine", "vectorized",
+        "--popsize", "A=100", "B=200", "--vicinity", "A-A=0", "--infectors", "A_0",
+        "--plugin", "quarantine", "B_0", "B_1", "--at", "5", "--target", "all",
+        "--plugin", "stat", "--interval", "5"])